@@ -0,0 +1,139 @@
+"""
+Compare requests per second under ASGI for the async-capable RLS middleware against the sync-only version that Django
+has to adapt with sync_to_async(). Each view also asserts that it sees its own request's app.user.
+
+    python benchmarks/async_middleware.py --requests 2000 --concurrency 50 --pool
+"""
+
+import argparse
+import asyncio
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from common import Timer, setup
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--requests", type=int, default=1000)
+parser.add_argument("--concurrency", type=int, default=20)
+parser.add_argument(
+    "--pool", action="store_true", help="Use Django's psycopg connection pool"
+)
+args = parser.parse_args()
+
+setup(pool=args.pool, ROOT_URLCONF=__name__, MIDDLEWARE=[])
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.handlers.asgi import ASGIHandler  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.urls import path  # noqa: E402
+
+from django_db_rls.middleware import AtomicRequestMiddleware  # noqa: E402
+
+User = get_user_model()
+
+
+class SyncOnlyAtomicRequestMiddleware(AtomicRequestMiddleware):
+    async_capable = False
+
+
+class FakeAuthMiddleware:
+    """
+    Authenticate every request as the user in the X-User header without touching the database.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        user = User(pk=int(request.headers["X-User"]))
+        request.user = user
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        return self.get_response(request)
+
+
+def current_user(cursor):
+    cursor.execute("SELECT current_setting('app.user', true)")
+    return cursor.fetchone()[0]
+
+
+def sync_view(request):
+    with connection.cursor() as cursor:
+        assert current_user(cursor) == request.headers["X-User"]
+    return HttpResponse()
+
+
+async def async_view(request):
+    def query():
+        with connection.cursor() as cursor:
+            return current_user(cursor)
+
+    assert await sync_to_async(query)() == request.headers["X-User"]
+    return HttpResponse()
+
+
+urlpatterns = [path("sync", sync_view), path("async", async_view)]
+
+
+async def request(app, path, user):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"x-user", str(user).encode())],
+    }
+    messages = []
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if body_sent:
+            # wait for the disconnect which never comes, Django cancels this once the response is sent
+            await asyncio.Future()
+        body_sent = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    assert messages[0]["status"] == 200, messages
+
+
+async def run(app, path, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(user):
+        async with semaphore:
+            await request(app, path, user)
+
+    with Timer() as timer:
+        await asyncio.gather(*(limited(user) for user in range(1, requests + 1)))
+    return requests / timer.elapsed
+
+
+def main():
+
+    for middleware in (SyncOnlyAtomicRequestMiddleware, AtomicRequestMiddleware):
+        settings.MIDDLEWARE = [
+            f"{__name__}.FakeAuthMiddleware",
+            f"{middleware.__module__}.{middleware.__qualname__}",
+        ]
+        app = ASGIHandler()
+        for view in ("/sync", "/async"):
+            rps = asyncio.run(run(app, view, args.requests, args.concurrency))
+            print(f"{middleware.__name__:<35} {view:<7} {rps:10.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Time the rls_changes() autodetector hook over a project state with many models with many policies each, where some
+policies are altered, added & removed. Doesn't require a database.
+
+    python benchmarks/autodetector.py --models 300 --policies 30
+"""
+
+import argparse
+
+from common import Timer, setup
+
+setup()
+
+from django.db import models  # noqa: E402
+from django.db.migrations.state import ModelState, ProjectState  # noqa: E402
+from django.db.models import Q  # noqa: E402
+
+from django_db_rls import policy  # noqa: E402
+from django_db_rls.apps import rls_changes  # noqa: E402
+from django_db_rls.db_utils import AppUser  # noqa: E402
+
+
+def model_state(name, policies):
+    return ModelState(
+        "bench",
+        name,
+        [
+            ("id", models.AutoField(primary_key=True)),
+            ("owner", models.IntegerField()),
+            ("group", models.IntegerField()),
+        ],
+        options={"db_rls": True, "db_rls_policies": policies},
+    )
+
+
+def states(model_count, policy_count):
+    from_state = ProjectState()
+    to_state = ProjectState()
+    for m in range(model_count):
+        name = f"Model{m}"
+        from_policies = []
+        to_policies = []
+        for p in range(policy_count):
+            # the from state policies are compiled strings, as rebuilt from migrations
+            from_policies.append(
+                policy.Policy(using=f'"bench_model{m}"."group" = {p}', name=f"p{p}")
+            )
+            # every 10th altered, then 1 removed & 1 added at the end
+            value = p + 1 if p % 10 == 0 else p
+            to_policies.append(
+                policy.Policy(using=Q(group=value) | Q(owner=AppUser()), name=f"p{p}")
+            )
+        to_policies[-1].name = f"p{policy_count}"
+        from_state.add_model(model_state(name, from_policies))
+        to_state.add_model(model_state(name, to_policies))
+    # rendered by the autodetector before hooks are called
+    to_state.apps
+    return from_state, to_state
+
+
+def run(from_state, to_state):
+    operations = 0
+    for (app_label, model_name), to_model_state in to_state.models.items():
+        from_model_state = from_state.models.get((app_label, model_name))
+        operations += len(
+            rls_changes(
+                app_label,
+                model_name,
+                from_state,
+                to_state,
+                from_model_state,
+                to_model_state,
+            )
+            or []
+        )
+    return operations
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", type=int, default=300)
+    parser.add_argument("--policies", type=int, default=30)
+    args = parser.parse_args()
+
+    policy.compiled_expressions.clear()
+    from_state, to_state = states(args.models, args.policies)
+    with Timer() as cold:
+        operations = run(from_state, to_state)
+
+    # again with fresh states, as when the autodetector is run more than once in a process
+    from_state, to_state = states(args.models, args.policies)
+    with Timer() as warm:
+        run(from_state, to_state)
+
+    print(f"{args.models} models x {args.policies} policies, {operations} operations")
+    print(f"cold: {cold.elapsed * 1000:8.1f} ms")
+    print(f"warm: {warm.elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Shared setup for the benchmarks, run them as scripts against a throwaway database configured with the standard libpq
+environment variables: PGDATABASE, PGHOST, PGPORT, PGUSER & PGPASSWORD.
+"""
+
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def setup(pool=False, **extra_settings):
+    database = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("PGDATABASE", "postgres"),
+        "HOST": os.environ.get("PGHOST", ""),
+        "PORT": os.environ.get("PGPORT", ""),
+        "USER": os.environ.get("PGUSER", ""),
+        "PASSWORD": os.environ.get("PGPASSWORD", ""),
+        # True or a dict of psycopg_pool.ConnectionPool options
+        "OPTIONS": {"pool": pool} if pool else {},
+    }
+    settings.configure(
+        **{
+            "DATABASES": {"default": database},
+            "INSTALLED_APPS": ["django.contrib.auth", "django.contrib.contenttypes"],
+            "USE_TZ": True,
+            **extra_settings,
+        }
+    )
+    django.setup()
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def summarise(samples):
+    """
+    Summarise latency samples, in seconds, as milliseconds along with operations per second.
+    """
+    samples = sorted(samples)
+    quantiles = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "iterations": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "ops_per_sec": len(samples) / sum(samples),
+    }
+
+
+def environment():
+    from django import get_version
+    from django.db import connection
+
+    return {
+        "python": platform.python_version(),
+        "django": get_version(),
+        "postgresql": connection.pg_version,
+        "driver": connection.Database.__name__,
+        "machine": platform.machine(),
+    }
+
+
+def write_results(path, benchmark, parameters, results):
+    """
+    Write results in a format comparable across runs with compare_results(): a list of dicts each with a unique
+    "name" along with the stats from summarise().
+    """
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "benchmark": benchmark,
+                "version": 1,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "environment": environment(),
+                "parameters": parameters,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+
+def compare_results(path, results, threshold):
+    """
+    Print the change in p50 latency of each result against those in a previous results file, returning the names of
+    those regressing by more than threshold, a fraction.
+    """
+    with open(path) as f:
+        baseline = {result["name"]: result for result in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        before = baseline.get(result["name"])
+        if before is None:
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(result["name"])
+            flag = "  REGRESSION"
+        print(
+            f"{result['name']:<60} {before['p50_ms']:9.3f} -> {result['p50_ms']:9.3f} ms"
+            f" {change:+8.1%}{flag}"
+        )
+    return regressions
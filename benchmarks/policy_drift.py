@@ -0,0 +1,61 @@
+"""
+Time diffing a synthetic catalog of policies, as compiled by Django, against the same policies as deparsed by
+Postgres. Doesn't require a database.
+
+    python benchmarks/policy_drift.py --tables 1000 --policies 5
+"""
+
+import argparse
+
+from common import Timer, setup
+
+setup()
+
+from django_db_rls.checks import diff_policies, normalise_expression  # noqa: E402
+
+DJANGO = """"{table}"."owner_{i}_id" = (nullif(current_setting('app.user', true), '')::int)"""
+POSTGRES = """(owner_{i}_id = (NULLIF(current_setting('app.user'::text, true), ''::text))::integer)"""
+
+
+def catalog(tables, policies, changed):
+    models = {}
+    expected = {}
+    actual = {}
+    for t in range(tables):
+        table = f"app_table_{t}"
+        models[table] = table
+        expected[table] = {}
+        actual[table] = {}
+        for i in range(policies):
+            expected[table][f"policy_{i}"] = (DJANGO.format(table=table, i=i), None)
+            # change every nth policy
+            j = i + 1 if changed and (t * policies + i) % changed == 0 else i
+            actual[table][f"policy_{i}"] = (POSTGRES.format(i=j), None)
+    return models, expected, actual
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=1000)
+    parser.add_argument("--policies", type=int, default=5)
+    parser.add_argument(
+        "--changed", type=int, default=100, help="Change every nth policy"
+    )
+    args = parser.parse_args()
+
+    models, expected, actual = catalog(args.tables, args.policies, args.changed)
+    total = args.tables * args.policies
+
+    normalise_expression.cache_clear()
+    with Timer() as cold:
+        drift = diff_policies(models, expected, actual)
+    with Timer() as warm:
+        diff_policies(models, expected, actual)
+
+    print(f"{total} policies, {len(drift)} drifted")
+    print(f"cold: {cold.elapsed * 1000:8.1f} ms")
+    print(f"warm: {warm.elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
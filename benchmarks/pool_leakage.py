@@ -0,0 +1,103 @@
+"""
+Stress Django's psycopg connection pool with many threads sharing a few connections, some of which misbehave by
+setting app.user at the session level (as code outside this library might with SET), and count how often a
+transaction sees a value that isn't its own, or has its request rejected by set_config() finding a stale value. Run
+without then with DB_RLS_POOL_SAFE to compare throughput, exiting with status 1 if DB_RLS_POOL_SAFE reports any of
+either so that it may be run as a test:
+
+    python benchmarks/pool_leakage.py --threads 32 --pool-size 4 --iterations 500
+"""
+
+import argparse
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from common import Timer, setup
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--threads", type=int, default=16)
+parser.add_argument("--pool-size", type=int, default=4)
+parser.add_argument("--iterations", type=int, default=200, help="Per thread")
+parser.add_argument(
+    "--misbehave",
+    type=float,
+    default=0.05,
+    help="Fraction of checkouts leaving a session-level app.user behind",
+)
+args = parser.parse_args()
+
+setup(pool={"min_size": args.pool_size, "max_size": args.pool_size, "timeout": 60})
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+
+from django_db_rls.db_utils import install_prefix_config  # noqa: E402
+from django_db_rls.middleware import request_context  # noqa: E402
+
+User = get_user_model()
+
+
+def current_user():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT current_setting('app.user', true)")
+        return cursor.fetchone()[0] or ""
+
+
+def worker(seed):
+    rng = random.Random(seed)
+    leaks = rejected = 0
+    try:
+        for _ in range(args.iterations):
+            user = User(pk=rng.randint(1, 1000))
+            choice = rng.random()
+            if choice < args.misbehave:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT set_config('app.user', '666', false)")
+            elif choice < 0.5:
+                # anonymous, autocommit
+                leaks += current_user() != ""
+            else:
+                try:
+                    with request_context(user):
+                        leaks += current_user() != str(user.pk)
+                except RuntimeError:
+                    # set_config() refuses to overwrite a stale value
+                    rejected += 1
+            # return the connection to the pool as at the end of a request
+            connection.close()
+    finally:
+        connection.close()
+    return leaks, rejected
+
+
+def run():
+    with ThreadPoolExecutor(args.threads) as executor:
+        with Timer() as timer:
+            results = list(executor.map(worker, range(args.threads)))
+    leaks, rejected = (sum(counts) for counts in zip(*results))
+    return leaks, rejected, args.threads * args.iterations / timer.elapsed
+
+
+def main():
+    # open the pool & warm up
+    run()
+    for pool_safe in (False, True):
+        settings.DB_RLS_POOL_SAFE = pool_safe
+        if pool_safe:
+            # as done by the app config when set at startup
+            connection_created.connect(install_prefix_config)
+        leaks, rejected, rate = run()
+        print(
+            f"DB_RLS_POOL_SAFE={pool_safe!s:<6} {leaks:6d} leaks {rejected:6d} rejected"
+            f" {rate:10.1f} checkouts/s"
+        )
+    # the last run, with DB_RLS_POOL_SAFE, must have neither
+    if leaks or rejected:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Measure what RLS costs on a synthetic table of each size given, filled with generate_series():
+
+ - latency & throughput of a few representative queries with RLS off, then on with each policy shape
+ - the per request overhead of each middleware, with RLS off so only the middleware is measured
+
+Each query runs in its own transaction with the context set as the middleware would, only the query is timed.
+Queries are run as an unprivileged role, as RLS doesn't apply to superusers, so the connecting role must be able to
+CREATE ROLE & SET ROLE to it (eg a superuser on a throwaway database). Results are written in a format comparable
+across runs, exiting with status 1 if any result's p50 regressed by more than --threshold:
+
+    python benchmarks/rls_overhead.py --rows 10000 100000 1000000 --output before.json
+    python benchmarks/rls_overhead.py --rows 10000 100000 1000000 --compare before.json
+"""
+
+import argparse
+import random
+import sys
+
+from common import Timer, compare_results, setup, summarise, write_results
+
+setup(
+    ROOT_URLCONF=__name__,
+    MIDDLEWARE=[],
+    INSTALLED_APPS=[
+        "django.contrib.auth",
+        "django.contrib.contenttypes",
+        "django_db_rls",
+    ],
+)
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.handlers.base import BaseHandler  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, models, transaction  # noqa: E402
+from django.db.models import Q  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.urls import path  # noqa: E402
+
+from django_db_rls.db_utils import (  # noqa: E402
+    AppUser,
+    InAppGroups,
+    create_policy,
+    disable_rls,
+    drop_policy,
+    enable_rls,
+    set_configs,
+)
+from django_db_rls.policy import IsSuperuserPolicy, Policy  # noqa: E402
+
+User = get_user_model()
+
+ROLE = "django_db_rls_bench"
+
+
+class Item(models.Model):
+    owner = models.IntegerField(db_index=True)
+    team = models.IntegerField(db_index=True)
+    title = models.CharField(max_length=100)
+
+    class Meta:
+        app_label = "django_db_rls"
+        db_table = "django_db_rls_bench_item"
+
+
+def owner():
+    return Policy(using=Q(owner=AppUser()), name="owner")
+
+
+# shape -> (policies, DB_RLS_OPTIMIZE_POLICIES), policies are ORed together as permissive policies
+SHAPES = {
+    "off": (None, False),
+    "owner": (lambda: [owner()], False),
+    "owner_optimized": (lambda: [owner()], True),
+    "owner_or_superuser": (lambda: [owner(), IsSuperuserPolicy()], False),
+    "owner_or_superuser_optimized": (lambda: [owner(), IsSuperuserPolicy()], True),
+    "owner_or_superuser_claims": (
+        lambda: [owner(), IsSuperuserPolicy(claims=True)],
+        False,
+    ),
+    # the superuser subquery only evaluated by writes, so reads pay for owner alone
+    "owner_or_superuser_update": (
+        lambda: [
+            owner(),
+            Policy(using=IsSuperuserPolicy().using, name="is_superuser", for_="UPDATE"),
+        ],
+        False,
+    ),
+    "team": (lambda: [Policy(using=InAppGroups("team"), name="team")], False),
+}
+
+QUERIES = {
+    "count": lambda user, users: Item.objects.count(),
+    "page": lambda user, users: list(Item.objects.order_by("-pk")[:20]),
+    # an item owned by the user, see fill()
+    "get": lambda user, users: Item.objects.filter(pk=users + user - 1).first(),
+}
+
+MIDDLEWARE = {
+    "none": ([], False),
+    "atomic": (["django_db_rls.middleware.AtomicRequestMiddleware"], False),
+    "atomic_prefix_config": (
+        ["django_db_rls.middleware.AtomicRequestMiddleware"],
+        True,
+    ),
+    "lazy": (["django_db_rls.middleware.LazyAtomicRequestMiddleware"], False),
+    "lazy_prefix_config": (
+        ["django_db_rls.middleware.LazyAtomicRequestMiddleware"],
+        True,
+    ),
+}
+
+
+class FakeAuthMiddleware:
+    """
+    Authenticate every request as the user in the X-User header without touching the database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user = User(pk=int(request.headers["X-User"]))
+        return self.get_response(request)
+
+
+def view(request):
+    QUERIES["page"](request.user.pk, None)
+    return HttpResponse()
+
+
+urlpatterns = [path("items", view)]
+
+
+def prepare(users):
+    # auth_user is queried by IsSuperuserPolicy
+    call_command("migrate", "auth", verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DO $$
+            BEGIN
+              IF NOT EXISTS (SELECT * FROM pg_roles WHERE rolname = '{ROLE}') THEN
+                CREATE ROLE "{ROLE}" NOLOGIN NOBYPASSRLS;
+              END IF;
+            END
+            $$
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO auth_user (
+                id, password, is_superuser, username, first_name, last_name, email, is_staff, is_active, date_joined
+            )
+            SELECT i, '', false, 'bench' || i, '', '', '', false, true, now() FROM generate_series(1, %s) i
+            ON CONFLICT DO NOTHING
+            """,
+            [users],
+        )
+        cursor.execute(f'GRANT SELECT ON auth_user TO "{ROLE}"')
+
+
+def fill(rows, users, groups):
+    table = connection.ops.quote_name(Item._meta.db_table)
+    with connection.schema_editor() as editor:
+        editor.execute(f"DROP TABLE IF EXISTS {table}")
+        editor.create_model(Item)
+    with connection.cursor() as cursor:
+        # item i is owned by user i % users + 1 so user u owns item users + u - 1
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (id, owner, team, title)
+            SELECT i, i %% %s + 1, i %% %s + 1, 'item ' || i FROM generate_series(1, %s) i
+            """,
+            [users, groups, rows],
+        )
+        cursor.execute(f"ANALYZE {table}")
+        cursor.execute(f'GRANT SELECT ON {table} TO "{ROLE}"')
+
+
+def apply_shape(shape):
+    policies, optimize = SHAPES[shape]
+    settings.DB_RLS_OPTIMIZE_POLICIES = optimize
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT polname FROM pg_policy WHERE polrelid = %s::regclass",
+            [Item._meta.db_table],
+        )
+        existing = [name for name, in cursor.fetchall()]
+    with connection.schema_editor() as editor:
+        for name in existing:
+            drop_policy(editor, name, Item)
+        if policies is None:
+            disable_rls(editor, Item)
+            return
+        enable_rls(editor, Item)
+        for policy in policies():
+            policy.compile(Item)
+            create_policy(
+                editor,
+                policy.name,
+                Item,
+                policy.using,
+                policy.check,
+                **policy.options,
+            )
+
+
+class as_role:
+    def __enter__(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SET ROLE "{ROLE}"')
+
+    def __exit__(self, *exc_info):
+        with connection.cursor() as cursor:
+            cursor.execute("RESET ROLE")
+
+
+def context(user, groups):
+    teams = sorted({user % groups + 1, (user + 1) % groups + 1})
+    return {
+        "app.user": user,
+        "app.is_superuser": "false",
+        "app.group_ids": "{" + ",".join(map(str, teams)) + "}",
+    }
+
+
+def measure_query(query, args, rng):
+    samples = []
+    for i in range(args.warmup + args.iterations):
+        user = rng.randint(1, args.users)
+        with transaction.atomic():
+            set_configs(context(user, args.groups))
+            with Timer() as timer:
+                query(user, args.users)
+        if i >= args.warmup:
+            samples.append(timer.elapsed)
+    return summarise(samples)
+
+
+def measure_requests(middleware, prefix_config, args, rng):
+    settings.MIDDLEWARE = [f"{__name__}.FakeAuthMiddleware", *middleware]
+    settings.DB_RLS_PREFIX_CONFIG = prefix_config
+    handler = BaseHandler()
+    handler.load_middleware()
+    factory = RequestFactory()
+    samples = []
+    for i in range(args.warmup + args.iterations):
+        request = factory.get(
+            "/items", headers={"X-User": str(rng.randint(1, args.users))}
+        )
+        with Timer() as timer:
+            response = handler.get_response(request)
+        assert response.status_code == 200, response
+        if i >= args.warmup:
+            samples.append(timer.elapsed)
+    return summarise(samples)
+
+
+def report(name, stats):
+    print(
+        f"{name:<60} {stats['p50_ms']:9.3f} ms p50 {stats['p95_ms']:9.3f} ms p95"
+        f" {stats['ops_per_sec']:10.1f} ops/s",
+        flush=True,
+    )
+    return {"name": name, **stats}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument(
+        "--shapes", nargs="+", choices=list(SHAPES), default=list(SHAPES)
+    )
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Compare against a previous --output")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Fraction of p50 latency considered a regression by --compare",
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    prepare(args.users)
+    results = []
+    for rows in args.rows:
+        fill(rows, args.users, args.groups)
+        for shape in args.shapes:
+            apply_shape(shape)
+            with as_role():
+                for query_name, query in QUERIES.items():
+                    stats = measure_query(query, args, rng)
+                    results.append(report(f"query/{rows}/{shape}/{query_name}", stats))
+
+    # on the smallest table with RLS off so only the middleware is measured
+    fill(min(args.rows), args.users, args.groups)
+    apply_shape("off")
+    with as_role():
+        for name, (middleware, prefix_config) in MIDDLEWARE.items():
+            stats = measure_requests(middleware, prefix_config, args, rng)
+            results.append(report(f"middleware/{name}", stats))
+
+    if args.output:
+        write_results(args.output, "rls_overhead", vars(args), results)
+    if args.compare and compare_results(args.compare, results, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
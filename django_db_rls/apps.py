@@ -1,15 +1,23 @@
+from itertools import chain
+
 from django.apps import AppConfig
-from django.core.checks import register
+from django.core.checks import Tags, register
+from django.db.backends.signals import connection_created
 from django.db.migrations.autodetector import registry
 from django.db.models.options import DEFAULT_NAMES
+from django.db.models.signals import post_delete, post_save
 
-from django_db_rls.checks import check_no_superuser, check_rls_tables_are_secure
+from django_db_rls.cache import invalidate
+from django_db_rls.checks import check_database, check_read_alias
 from django_db_rls.db_utils import (
     AddPolicy,
     AlterForceRLS,
     AlterPolicy,
     AlterRLS,
     RemovePolicy,
+    install_prefix_config,
+    policy_scope,
+    use_pool_safe,
 )
 
 DEFAULT_NAMES.update(["db_rls", "db_rls_force", "db_rls_policies"])
@@ -19,61 +27,70 @@ def rls_changes(
     app_label, model_name, from_state, to_state, from_model_state, to_model_state
 ):
     operations = []
+    from_options = from_model_state.options if from_model_state else {}
+    to_options = to_model_state.options
 
-    if (
-        from_model_state.options.get("db_rls") if from_model_state else None
-    ) != to_model_state.options.get("db_rls"):
-        operations += [AlterRLS(model_name, to_model_state.options.get("db_rls"))]
-
-    if (
-        from_model_state.options.get("db_rls_force") if from_model_state else None
-    ) != to_model_state.options.get("db_rls_force"):
-        operations += [
-            AlterForceRLS(model_name, to_model_state.options.get("db_rls_force"))
-        ]
-
-    from_db_rls_policies = (
-        from_model_state.options.get("db_rls_policies", []) if from_model_state else []
-    )
-    to_db_rls_policies = to_model_state.options.get("db_rls_policies", [])
+    if from_options.get("db_rls") != to_options.get("db_rls"):
+        operations += [AlterRLS(model_name, to_options.get("db_rls"))]
 
-    # compile before passing to operation to avoid complex objects from being serialized
+    if from_options.get("db_rls_force") != to_options.get("db_rls_force"):
+        operations += [AlterForceRLS(model_name, to_options.get("db_rls_force"))]
 
-    for policy in from_db_rls_policies:
-        model = to_state.apps.get_model(app_label, model_name)
-        policy.compile(model)
+    from_db_rls_policies = from_options.get("db_rls_policies", [])
+    to_db_rls_policies = to_options.get("db_rls_policies", [])
 
-    for policy in to_db_rls_policies:
+    if from_db_rls_policies or to_db_rls_policies:
+        # compile before passing to operation to avoid complex objects from being serialized
         model = to_state.apps.get_model(app_label, model_name)
-        policy.compile(model)
-
-    altered_policies = [
-        policy
-        for policy in to_db_rls_policies
-        if policy not in from_db_rls_policies
-        and policy.name in [from_policy.name for from_policy in from_db_rls_policies]
-    ]
-    new_policies = [
-        policy
-        for policy in to_db_rls_policies
-        if policy not in from_db_rls_policies and policy not in altered_policies
-    ]
+        for policy in chain(from_db_rls_policies, to_db_rls_policies):
+            policy.compile(model)
+
+    from_policies = {policy.name: policy for policy in from_db_rls_policies}
+    to_policies = {policy.name: policy for policy in to_db_rls_policies}
+
+    altered_policies = []
+    replaced_policies = []
+    new_policies = []
+    for name, policy in to_policies.items():
+        if name not in from_policies:
+            new_policies.append(policy)
+        elif policy != from_policies[name]:
+            from_policy = from_policies[name]
+            if policy_scope(policy) == policy_scope(from_policy):
+                altered_policies.append(policy)
+            else:
+                replaced_policies.append((from_policy, policy))
     removed_policies = [
-        policy
-        for policy in from_db_rls_policies
-        if policy.name not in [to_policy.name for to_policy in to_db_rls_policies]
+        policy for name, policy in from_policies.items() if name not in to_policies
     ]
 
     operations += [
-        AlterPolicy(model_name, policy.name, policy.using, policy.check)
+        AlterPolicy(
+            model_name, policy.name, policy.using, policy.check, **policy.options
+        )
         for policy in altered_policies
     ]
+    for from_policy, policy in replaced_policies:
+        operations += [
+            RemovePolicy(
+                model_name,
+                from_policy.name,
+                from_policy.using,
+                from_policy.check,
+                **from_policy.options,
+            ),
+            AddPolicy(
+                model_name, policy.name, policy.using, policy.check, **policy.options
+            ),
+        ]
     operations += [
-        AddPolicy(model_name, policy.name, policy.using, policy.check)
+        AddPolicy(model_name, policy.name, policy.using, policy.check, **policy.options)
         for policy in new_policies
     ]
     operations += [
-        RemovePolicy(model_name, policy.name, policy.using, policy.check)
+        RemovePolicy(
+            model_name, policy.name, policy.using, policy.check, **policy.options
+        )
         for policy in removed_policies
     ]
 
@@ -87,5 +104,10 @@ class DjangoDbRlsConfig(AppConfig):
     name = "django_db_rls"
 
     def ready(self):
-        register()(check_no_superuser)
-        register()(check_rls_tables_are_secure)
+        register()(check_read_alias)
+        # queries the database so only run when requested, eg by migrate or check --database
+        register(Tags.database)(check_database)
+        post_save.connect(invalidate)
+        post_delete.connect(invalidate)
+        if use_pool_safe():
+            connection_created.connect(install_prefix_config)
@@ -0,0 +1,224 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+from django.db.models import Manager, QuerySet
+from django.db.models.sql import Query
+
+from django_db_rls.db_utils import get_config_cache
+from django_db_rls.metrics import incr
+from django_db_rls.middleware import apply_lazy_context
+
+MISSING = object()
+
+
+class ResultCache:
+    """
+    In-process LRU cache with a TTL for query results, keyed by cache_key() so that results are only ever shared
+    between the same RLS context.
+
+    Values are pickled like Django's locmem cache so that callers don't share instances.
+    """
+
+    def __init__(self, maxsize=None, ttl=None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        if self._maxsize is not None:
+            return self._maxsize
+        return getattr(settings, "DB_RLS_CACHE_MAXSIZE", 1000)
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, "DB_RLS_CACHE_TTL", 60)
+
+    def get(self, key, default=MISSING):
+        with self.lock:
+            try:
+                expires, value = self.entries[key]
+            except KeyError:
+                return default
+            if expires < time.monotonic():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.set_pickled(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ttl)
+
+    def set_pickled(self, key, value, ttl=None):
+        """
+        Like set() but for a value already pickled, eg to cache it as it is now but only later.
+        """
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+result_cache = ResultCache()
+
+# db_table -> generation, bumped to invalidate all results from the table
+generations = {}
+generations_lock = threading.Lock()
+
+
+def bump_generation(table):
+    with generations_lock:
+        generations[table] = generations.get(table, 0) + 1
+
+
+def invalidate(sender, using, **kwargs):
+    """
+    post_save & post_delete receiver invalidating cached results for the model's table. Bulk operations such as
+    QuerySet.update() don't send signals and are left to the TTL.
+
+    Invalidated again once the transaction commits, as until then other connections still read & may cache the rows
+    from before the change.
+    """
+    table = sender._meta.db_table
+    bump_generation(table)
+    transaction.on_commit(partial(bump_generation, table), using=using)
+
+
+def query_tables(query):
+    """
+    Return the tables the query reads, including those of its subqueries, eg filter(x__in=...), Subquery & Exists.
+    """
+    tables = {join.table_name for join in query.alias_map.values()}
+    nodes = [
+        query.where,
+        *query.annotations.values(),
+        *query.order_by,
+        *query.combined_queries,
+    ]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, Query):
+            tables |= query_tables(node)
+        elif hasattr(node, "get_source_expressions"):
+            nodes += node.get_source_expressions()
+    return tables
+
+
+def cache_key(queryset):
+    """
+    Derive a key for the queryset's results from the database, the RLS context set with set_config() in the current
+    transaction, the SQL and the generation of the tables queried, including those of subqueries. Prefetches aren't
+    covered so aren't cached by cached().
+
+    Only context set with set_config() (including the middleware) is known, a context set by other means must not be
+    relied upon for caching. A context the middleware is yet to apply lazily is applied first.
+
+    Raises EmptyResultSet for a queryset that can't match anything, eg none().
+    """
+    using = queryset.db
+    apply_lazy_context(using)
+    query = queryset.query
+    sql, params = query.get_compiler(using=using).as_sql()
+    tables = sorted(query_tables(query))
+    context = sorted(get_config_cache(using).items())
+    key = repr(
+        (
+            using,
+            sql,
+            params,
+            context,
+            [(table, generations.get(table, 0)) for table in tables],
+        )
+    )
+    return "django_db_rls:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_or_fetch(key, fetch, ttl=None, cache=result_cache):
+    """
+    Low-level API returning the value cached for key, otherwise calling fetch() and caching its result.
+    """
+    value = cache.get(key)
+    if value is MISSING:
+        value = fetch()
+        cache.set(key, value, ttl)
+    return value
+
+
+class CachedQuerySetMixin:
+    """
+    QuerySet mixin adding cached() to cache the results of evaluating the queryset per RLS context:
+
+        Note.objects.filter(archived=False).cached(ttl=30)
+    """
+
+    _rls_cache = False
+    _rls_cache_ttl = None
+
+    def cached(self, ttl=None):
+        clone = self._chain()
+        clone._rls_cache = True
+        clone._rls_cache_ttl = ttl
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._rls_cache = self._rls_cache
+        clone._rls_cache_ttl = self._rls_cache_ttl
+        return clone
+
+    def _fetch_all(self):
+        if self._rls_cache and self._result_cache is None:
+            try:
+                key = cache_key(self)
+            except EmptyResultSet:
+                # runs no query, so there's nothing to cache
+                super()._fetch_all()
+                return
+            results = result_cache.get(key)
+            model = self.model._meta.label
+            if results is MISSING:
+                incr("django_db_rls.cache.miss", model=model)
+                # cached before prefetching, whose tables aren't in the key
+                self._result_cache = list(self._iterable_class(self))
+                self._cache_results(key)
+            else:
+                incr("django_db_rls.cache.hit", model=model)
+                self._result_cache = results
+        # prefetch_related() is run regardless
+        super()._fetch_all()
+
+    def _cache_results(self, key):
+        value = pickle.dumps(self._result_cache, pickle.HIGHEST_PROTOCOL)
+        store = partial(result_cache.set_pickled, key, value, self._rls_cache_ttl)
+        using = self.db
+        if (
+            not connections[using].in_atomic_block
+            or get_config_cache(using).get("transaction_read_only") == "on"
+        ):
+            store()
+        else:
+            # rows read in a write transaction may include its own writes, which may yet be rolled back
+            transaction.on_commit(store, using=using)
+
+
+class CachedQuerySet(CachedQuerySetMixin, QuerySet):
+    pass
+
+
+CachedManager = Manager.from_queryset(CachedQuerySet)
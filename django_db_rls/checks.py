@@ -1,17 +1,197 @@
+import hashlib
+import json
+import re
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+
+from asgiref.local import Local
 from django.apps import apps
-from django.core.checks import Critical
-from django.db import connection
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Critical, Warning
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import BooleanField, Exists, Index, UniqueConstraint
+from django.db.models.expressions import Col
+from django.db.models.lookups import Exact, Lookup
+from django.db.models.sql.datastructures import Join
+from django.db.models.sql.where import AND, WhereNode
+
+from django_db_rls.db_utils import InAppGroups
+from django_db_rls.routers import ReadOnlyRouter, get_read_alias
+
+
+def get_rls_databases(databases=None):
+    """
+    Return the aliases serving requests, where RLS must apply: DB_RLS_DATABASES, defaulting to the default database
+    and DB_RLS_READ_ALIAS. (Not every alias as a SUPERUSER alias may be used for migrations.)
+
+    Restricted to databases if given, ie those passed to checks tagged Tags.database.
+    """
+    aliases = getattr(settings, "DB_RLS_DATABASES", None)
+    if aliases is None:
+        aliases = [DEFAULT_DB_ALIAS]
+        read_alias = get_read_alias()
+        if read_alias is not None and read_alias in connections:
+            aliases.append(read_alias)
+    return [
+        alias
+        for alias in aliases
+        if connections[alias].vendor == "postgresql"
+        and (databases is None or alias in databases)
+    ]
+
+
+# A checksum of everything in the catalog the database checks depend on for the given tables: the current role & its
+# direct memberships, the search path (for to_regclass()), the tables' owners & RLS flags, policies and indexes
+CATALOG_FINGERPRINT = """
+WITH checked AS (
+    SELECT c.oid, c.relname, c.relnamespace, c.relowner, c.relrowsecurity, c.relforcerowsecurity
+    FROM unnest(%s::text[]) AS t(name)
+    JOIN pg_class c ON c.oid = to_regclass(quote_ident(t.name))
+)
+SELECT md5(concat_ws(
+    '|',
+    current_user,
+    current_schemas(false)::text,
+    (
+        SELECT concat_ws(',', r.rolsuper, r.rolbypassrls, string_agg(m.roleid::text, ',' ORDER BY m.roleid))
+        FROM pg_roles r LEFT JOIN pg_auth_members m ON m.member = r.oid
+        WHERE r.rolname = current_user
+        GROUP BY r.rolsuper, r.rolbypassrls
+    ),
+    (
+        SELECT string_agg(
+            concat_ws(',', c.oid, c.relname, c.relnamespace, c.relowner, c.relrowsecurity, c.relforcerowsecurity),
+            ';' ORDER BY c.oid
+        )
+        FROM checked c
+    ),
+    (
+        SELECT string_agg(
+            concat_ws(
+                ',', p.oid, p.polrelid, p.polname, pg_get_expr(p.polqual, p.polrelid),
+                pg_get_expr(p.polwithcheck, p.polrelid)
+            ),
+            ';' ORDER BY p.oid
+        )
+        FROM pg_policy p JOIN checked c ON p.polrelid = c.oid
+    ),
+    (
+        SELECT string_agg(concat_ws(',', i.indexrelid, i.indrelid, i.indkey::text), ';' ORDER BY i.indexrelid)
+        FROM pg_index i JOIN checked c ON i.indrelid = c.oid
+    )
+))
+"""
+
+MISSING = object()
+
+state = Local()
+
 
+@contextmanager
+def catalog_snapshot():
+    """
+    Reuse the catalog fingerprints of each database for the duration, eg a run of the checks, so that each is only
+    fetched once.
+    """
+    state.fingerprints = {}
+    try:
+        yield
+    finally:
+        del state.fingerprints
 
-def check_no_superuser(app_configs, **kwargs):
+
+def cached_fetch(using, name, inputs, fetch):
+    """
+    Return fetch(cursor) for the database.
+
+    With DB_RLS_CHECKS_CACHE set to a cache alias, results are cached keyed by a fingerprint of the catalog, fetched in
+    a single query, and the inputs, eg the table names, so that repeated invocations skip the checks' queries until the
+    catalog changes. Only the catalog of the tables named by the inputs is fingerprinted, so they must be the tables
+    that fetch() depends on. Use a cache shared between processes, eg file-based or Redis, for the benefit to outlive the
+    process.
+    """
+    conn = connections[using]
+    cache_alias = getattr(settings, "DB_RLS_CHECKS_CACHE", None)
+    if cache_alias is None:
+        with conn.cursor() as cursor:
+            return fetch(cursor)
+
+    inputs = sorted(inputs)
+    fingerprints = getattr(state, "fingerprints", {})
+    fingerprint = fingerprints.get((using, tuple(inputs)))
+    if fingerprint is None:
+        with conn.cursor() as cursor:
+            cursor.execute(CATALOG_FINGERPRINT, [inputs])
+            fingerprint = fingerprints[(using, tuple(inputs))] = cursor.fetchone()[0]
+    database = [conn.settings_dict.get(key) for key in ("HOST", "PORT", "NAME")]
+    digest = hashlib.sha256(repr((database, fingerprint, inputs)).encode()).hexdigest()
+    key = f"django_db_rls.checks.{name}.{digest}"
+    cache = caches[cache_alias]
+    value = cache.get(key, MISSING)
+    if value is MISSING:
+        with conn.cursor() as cursor:
+            value = fetch(cursor)
+        cache.set(key, value)
+    return value
+
+
+def check_read_alias(app_configs, **kwargs):
     errors = []
-    # specifically check the default connection
-    with connection.cursor() as cursor:
-        cursor.execute("SELECT rolsuper FROM pg_roles WHERE rolname = current_user")
-        if cursor.fetchone()[0]:
+    read_alias = get_read_alias()
+    if read_alias is None:
+        return errors
+
+    if read_alias not in connections:
+        errors.append(
+            Critical(
+                f"DB_RLS_READ_ALIAS '{read_alias}' is not in DATABASES.",
+                id="django_db_rls.E002",
+            )
+        )
+    router = "django_db_rls.routers.ReadOnlyRouter"
+    if not any(
+        r == router or isinstance(r, ReadOnlyRouter) for r in settings.DATABASE_ROUTERS
+    ):
+        errors.append(
+            Warning(
+                "DB_RLS_READ_ALIAS is set but ReadOnlyRouter is not installed, queries in read-only requests will not "
+                "be routed to the database the context is applied to.",
+                hint=f"Add '{router}' to DATABASE_ROUTERS.",
+                id="django_db_rls.W005",
+            )
+        )
+    return errors
+
+
+def check_database(app_configs, databases=None, **kwargs):
+    """
+    The checks querying the database, run together within catalog_snapshot().
+    """
+    with catalog_snapshot():
+        return [
+            *check_no_superuser(app_configs, databases=databases),
+            *check_rls_tables_are_secure(app_configs, databases=databases),
+            *check_rls_policies_in_sync(app_configs, databases=databases),
+            *check_rls_policy_indexes(app_configs, databases=databases),
+        ]
+
+
+def fetch_superuser(cursor):
+    cursor.execute("SELECT rolsuper FROM pg_roles WHERE rolname = current_user")
+    return cursor.fetchone()[0]
+
+
+def check_no_superuser(app_configs, databases=None, **kwargs):
+    errors = []
+    if databases is None:
+        return errors
+    for alias in get_rls_databases(databases):
+        if cached_fetch(alias, "superuser", [], fetch_superuser):
             errors.append(
                 Critical(
-                    "The default database has SUPERUSER privilege. Row-level security does NOT apply to SUPERUSER roles.",
+                    f"The '{alias}' database has SUPERUSER privilege. Row-level security does NOT apply to SUPERUSER roles.",
                     hint="Create a new role without SUPERUSER.",
                     id="django_db_rls.E001",
                 )
@@ -19,8 +199,10 @@ def check_no_superuser(app_configs, **kwargs):
     return errors
 
 
-def check_rls_tables_are_secure(app_configs, **kwargs):
+def check_rls_tables_are_secure(app_configs, databases=None, **kwargs):
     errors = []
+    if databases is None:
+        return errors
 
     if app_configs:
         models = [
@@ -29,22 +211,851 @@ def check_rls_tables_are_secure(app_configs, **kwargs):
     else:
         models = apps.get_models()
 
-    with connection.cursor() as cursor:
-        for model in models:
-            if not getattr(model._meta, "db_rls", False):
+    models = {
+        model._meta.db_table: model
+        for model in models
+        if getattr(model._meta, "db_rls", False)
+        or getattr(model._meta, "db_rls_force", False)
+    }
+    if not models:
+        return errors
+
+    for alias in get_rls_databases(databases):
+        errors += check_tables(alias, models)
+    return errors
+
+
+def fetch_rls_status(cursor, table_names):
+    """
+    Fetch whether RLS is enabled, forced & active for all the given tables in one query, tables that don't exist yet
+    are absent as they're yet to be migrated.
+    """
+    cursor.execute(
+        """
+        SELECT t.name, c.relrowsecurity, c.relforcerowsecurity, row_security_active(c.oid)
+        FROM unnest(%s::text[]) AS t(name)
+        JOIN pg_class c ON c.oid = to_regclass(quote_ident(t.name))
+        """,
+        [list(table_names)],
+    )
+    return cursor.fetchall()
+
+
+def check_tables(alias, models):
+    errors = []
+
+    rows = cached_fetch(
+        alias,
+        "rls_status",
+        list(models),
+        lambda cursor: fetch_rls_status(cursor, models),
+    )
+
+    for table_name, rls_enabled, rls_forced, rls_active in rows:
+        model = models[table_name]
+
+        if getattr(model._meta, "db_rls", False) and not rls_active:
+            errors.append(
+                Critical(
+                    f"Row-level security is NOT active for table '{table_name}' on the '{alias}' database.",
+                    hint=(
+                        None
+                        if not rls_enabled
+                        else "Row-level security is enabled but does not apply to the current role, it may be the table owner or have BYPASSRLS."
+                    ),
+                    obj=model,
+                    id="django_db_rls.C001",
+                )
+            )
+
+        db_rls_force = getattr(model._meta, "db_rls_force", None)
+        if db_rls_force and not rls_forced:
+            errors.append(
+                Critical(
+                    f"Row-level security is NOT forced for table '{table_name}' on the '{alias}' database.",
+                    hint="The table owner bypasses row-level security unless it is forced.",
+                    obj=model,
+                    id="django_db_rls.C002",
+                )
+            )
+        elif db_rls_force is False and rls_forced:
+            errors.append(
+                Warning(
+                    f"Row-level security is forced for table '{table_name}' on the '{alias}' database but db_rls_force = False.",
+                    obj=model,
+                    id="django_db_rls.W001",
+                )
+            )
+
+    return errors
+
+
+PolicyDrift = namedtuple("PolicyDrift", ["model", "name", "kind", "expected", "actual"])
+
+TOKEN = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<string>E?'(?:[^']|'')*')
+    | (?P<identifier>"(?:[^"]|"")*"|[a-z_][\w$]*)
+    | (?P<number>\d+(?:\.\d+)?)
+    | (?P<cast>::\s*[a-z_][\w.]*(?:\s+(?:varying|precision|with|without|time|zone))*(?:\s*\(\s*\d+(?:\s*,\s*\d+)?\s*\))?(?:\[\])*)
+    | (?P<punctuation>[(),.\[\]])
+    | (?P<operator>[-+*/<>=~!@#%^&|`?]+)
+    | (?P<other>.)
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+TYPE = re.compile(r"([a-z_][\w.]*(?:\s+[a-z]+)*)\s*(\([\d\s,]*\))?((?:\[\])*)")
+
+# aliases Postgres deparses by their canonical name
+TYPE_ALIASES = {
+    "int": "integer",
+    "int2": "smallint",
+    "int4": "integer",
+    "int8": "bigint",
+    "bool": "boolean",
+    "float4": "real",
+    "float8": "double precision",
+    "decimal": "numeric",
+    "varchar": "character varying",
+    "timestamptz": "timestamp with time zone",
+}
+# casts Postgres adds when deparsing, eg to text for string literals & varchar columns
+IMPLICIT_CASTS = {"text", "character varying", "unknown"}
+# types whose negative constants Postgres deparses as a cast string literal, eg '-1'::integer
+NUMERIC_TYPES = {"smallint", "integer", "bigint", "numeric", "real", "double precision"}
+NUMBER = re.compile(r"'([-+]?\d+(?:\.\d+)?)'")
+
+# Postgres precedence, higher binds tighter, any operator not listed binds at OTHER_OPERATOR
+PRECEDENCE = {
+    "or": 1,
+    "and": 2,
+    "not": 3,
+    "is": 4,
+    "=": 5,
+    "<>": 5,
+    "!=": 5,
+    "<": 5,
+    ">": 5,
+    "<=": 5,
+    ">=": 5,
+    "in": 6,
+    "between": 6,
+    "like": 6,
+    "ilike": 6,
+    "+": 8,
+    "-": 8,
+    "*": 9,
+    "/": 9,
+    "%": 9,
+    "^": 10,
+}
+OTHER_OPERATOR = 7
+UNARY = 11
+# operators Postgres deparses differently
+OPERATORS = {
+    "!=": "<>",
+    "like": "~~",
+    "ilike": "~~*",
+    "not like": "!~~",
+    "not ilike": "!~~*",
+}
+# keywords that are never function names even when followed by a parenthesis
+KEYWORDS = {
+    "and",
+    "or",
+    "not",
+    "in",
+    "between",
+    "is",
+    "as",
+    "select",
+    "from",
+    "where",
+    "having",
+    "on",
+    "using",
+    "when",
+    "then",
+    "else",
+    "exists",
+    "values",
+}
+END = (None, None)
+
+
+def normalise_type(type):
+    base, modifier, array = TYPE.fullmatch(" ".join(type.lower().split())).groups()
+    return TYPE_ALIASES.get(base, base), (modifier or "").replace(" ", "") + array
+
+
+class ExpressionParser:
+    """
+    Parse an expression into a tree of tuples, just enough of the grammar for policies, following Postgres precedence
+    so that redundant parentheses are dropped while those that change the meaning are kept.
+    """
+
+    def __init__(self, sql, table_name):
+        self.tokens = [
+            (match.lastgroup, match[0])
+            for match in TOKEN.finditer(sql)
+            if match.lastgroup != "space"
+        ]
+        self.position = 0
+        self.table_name = table_name
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return END
+
+    def next(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        items = self.parse_items(None)
+        return items[0] if len(items) == 1 else ("group", items)
+
+    def parse_items(self, close):
+        """
+        Parse comma separated items up to & including close.
+        """
+        items = []
+        while True:
+            kind, value = self.peek()
+            if kind is None or value == close:
+                self.next()
+                return items
+            items.append(self.parse_sequence(close))
+            if self.peek()[1] == ",":
+                self.next()
+
+    def parse_sequence(self, close):
+        """
+        Parse expressions up to the next comma or close, eg the clauses of a subquery, dropping aliases.
+        """
+        elements = []
+        while True:
+            kind, value = self.peek()
+            if kind is None or value in (",", close):
+                break
+            elements.append(self.parse_expression(0))
+        elements = [
+            element
+            for i, element in enumerate(elements)
+            if element != ("atom", "as")
+            and (i == 0 or elements[i - 1] != ("atom", "as"))
+        ]
+        return elements[0] if len(elements) == 1 else ("sequence", elements)
+
+    def parse_expression(self, min_precedence):
+        left = self.parse_prefix()
+        while True:
+            kind, value = self.peek()
+            if kind == "cast":
+                self.next()
+                left = self.cast(left, value[2:])
                 continue
+            if value == "[":
+                self.next()
+                left = ("subscript", left, self.parse_items("]"))
+                continue
+            if kind == "operator":
+                operator = value
+            elif kind == "identifier" and value.lower() in PRECEDENCE:
+                operator = value.lower()
+            else:
+                return left
+            precedence = PRECEDENCE.get(operator, OTHER_OPERATOR)
+            if precedence <= min_precedence:
+                return left
+            self.next()
+            if operator == "not":
+                # not in, not like, etc.
+                operator += " " + self.next()[1].lower()
+            if operator in ("and", "or"):
+                right = self.parse_expression(precedence)
+                items = left[1] if left[0] == operator else [left]
+                items += right[1] if right[0] == operator else [right]
+                left = (operator, items)
+            elif operator == "is":
+                if self.peek()[1].lower() == "not":
+                    self.next()
+                    operator += " not"
+                left = ("operator", operator, left, self.parse_prefix())
+            elif operator.endswith("in"):
+                left = self.parse_in(operator, left)
+            elif operator.endswith("between"):
+                left = self.parse_between(operator, left, precedence)
+            else:
+                operator = OPERATORS.get(operator, operator)
+                left = ("operator", operator, left, self.parse_expression(precedence))
+
+    def parse_in(self, operator, left):
+        if self.peek()[1] != "(":
+            return ("operator", operator, left, self.parse_prefix())
+        self.next()
+        items = self.parse_items(")")
+        if len(items) == 1 and items[0][0] == "sequence":
+            # subquery
+            return ("operator", operator, left, ("group", items))
+        # a list, deparsed by Postgres as an array
+        comparison, quantifier = ("=", "any") if operator == "in" else ("<>", "all")
+        return (
+            "operator",
+            comparison,
+            left,
+            ("call", quantifier, [("array", items)]),
+        )
+
+    def parse_between(self, operator, left, precedence):
+        # deparsed by Postgres as the comparisons, the bounds are parsed above AND
+        low = self.parse_expression(precedence)
+        if self.peek()[1].lower() != "and":
+            return ("operator", operator, left, low)
+        self.next()
+        high = self.parse_expression(precedence)
+        if operator == "between":
+            return (
+                "and",
+                [("operator", ">=", left, low), ("operator", "<=", left, high)],
+            )
+        return ("or", [("operator", "<", left, low), ("operator", ">", left, high)])
+
+    def parse_prefix(self):
+        kind, value = self.next()
+        if value == "(":
+            items = self.parse_items(")")
+            if len(items) == 1 and items[0][0] != "sequence":
+                return items[0]
+            return ("group", items)
+        if kind == "string":
+            if value[0] in "Ee":
+                # escape string syntax from psycopg2, Postgres deparses as a standard string
+                value = value[1:].replace("\\\\", "\\")
+            return ("atom", value)
+        if kind == "operator" and value in ("-", "+"):
+            operand = self.parse_expression(UNARY)
+            if operand[0] == "atom" and operand[1][0].isdigit():
+                # a signed constant
+                return ("atom", operand[1] if value == "+" else value + operand[1])
+            return ("unary", value, operand)
+        if kind != "identifier":
+            return ("atom", value)
+
+        name = self.identifier(value)
+        if name == "not" and value[0] != '"':
+            return ("not", self.parse_expression(PRECEDENCE["not"]))
+        if name == "exists":
+            return ("exists", self.parse_prefix())
+        if name == "array" and self.peek()[1] == "[":
+            self.next()
+            return ("array", self.parse_items("]"))
+        parts = [name]
+        while self.peek()[1] == "." and self.position + 1 < len(self.tokens):
+            self.next()
+            parts.append(self.identifier(self.next()[1]))
+        if len(parts) > 1 and parts[0] == self.table_name:
+            parts = parts[1:]
+        name = ".".join(parts)
+        if self.peek()[1] == "(" and name not in KEYWORDS:
+            self.next()
+            return ("call", name, self.parse_items(")"))
+        return ("atom", name)
+
+    def identifier(self, value):
+        if value[0] == '"':
+            value = value[1:-1].replace('""', '"')
+        return value.lower()
+
+    def cast(self, node, type):
+        base, suffix = normalise_type(type)
+        if node[0] == "atom" and base in NUMERIC_TYPES and not suffix:
+            number = NUMBER.fullmatch(node[1])
+            if number:
+                # a constant, eg '-1'::integer
+                return ("atom", number[1].lstrip("+"))
+        if (base in IMPLICIT_CASTS and not suffix) or (
+            node[0] == "atom" and node[1].startswith("'")
+        ):
+            # added by Postgres or inferred by context
+            return node
+        return ("cast", node, base + suffix)
+
 
-            table_name = model._meta.db_table
-            cursor.execute("SELECT row_security_active(%s);", [table_name])
-            (rls_active,) = cursor.fetchone()
-
-            if not rls_active:
-                errors.append(
-                    Critical(
-                        f"Row-level security is NOT active for table '{table_name}'.",
-                        obj=model,
-                        id="django_db_rls.C001",
-                    )
+def serialise(node):
+    """
+    Serialise a tree from ExpressionParser fully parenthesised.
+    """
+    kind, *rest = node
+    if kind == "atom":
+        return rest[0]
+    if kind in ("and", "or"):
+        return "(" + f" {kind} ".join(serialise(item) for item in rest[0]) + ")"
+    if kind == "operator":
+        operator, left, right = rest
+        return f"({serialise(left)} {operator} {serialise(right)})"
+    if kind == "not":
+        return f"(not {serialise(rest[0])})"
+    if kind == "unary":
+        return f"({rest[0]}{serialise(rest[1])})"
+    if kind == "exists":
+        return f"exists({serialise(rest[0])})"
+    if kind == "cast":
+        return f"{serialise(rest[0])}::{rest[1]}"
+    if kind == "call":
+        return f"{rest[0]}({', '.join(serialise(item) for item in rest[1])})"
+    if kind == "array":
+        return f"array[{', '.join(serialise(item) for item in rest[0])}]"
+    if kind == "subscript":
+        return f"{serialise(rest[0])}[{', '.join(serialise(item) for item in rest[1])}]"
+    if kind == "sequence":
+        return " ".join(serialise(item) for item in rest[0])
+    # group
+    return f"({', '.join(serialise(item) for item in rest[0])})"
+
+
+@lru_cache(maxsize=None)
+def normalise_expression(sql, table_name):
+    """
+    Normalise a policy expression compiled by Django or deparsed by Postgres so that they can be compared: parsed &
+    serialised fully parenthesised, lowercased, unquoted and unqualified outside of string literals, with type names
+    canonicalised, the casts Postgres adds dropped and BETWEEN & signed constants rewritten as Postgres stores them.
+    Parentheses that change precedence & other casts are kept so that changing them is drift.
+    """
+    if sql is None:
+        return None
+    return serialise(ExpressionParser(sql, table_name.lower()).parse())
+
+
+# a policy's name, using, check, command, permissive & roles, in the same form as expected_policy()
+POLICY_COLUMNS = """\
+p.polname,
+pg_get_expr(p.polqual, p.polrelid),
+pg_get_expr(p.polwithcheck, p.polrelid),
+CASE p.polcmd WHEN 'r' THEN 'SELECT' WHEN 'a' THEN 'INSERT' WHEN 'w' THEN 'UPDATE' WHEN 'd' THEN 'DELETE' ELSE 'ALL' END,
+p.polpermissive,
+array(SELECT CASE WHEN r = 0 THEN 'public' ELSE pg_get_userbyid(r)::text END FROM unnest(p.polroles) AS r)
+"""
+
+
+def catalog_policy(using, check, command, permissive, roles):
+    return (using, check, command, permissive, tuple(sorted(roles)))
+
+
+def expected_policy(policy):
+    """
+    Return the compiled policy as (using, check, command, permissive, roles) to compare with those fetched.
+    """
+    roles = policy.to or ["public"]
+    # Postgres ignores other roles given alongside PUBLIC
+    if any(role.lower() == "public" for role in roles):
+        roles = ["public"]
+    return catalog_policy(
+        policy.using, policy.check, policy.for_, not policy.as_restrictive, roles
+    )
+
+
+def describe_scope(policy):
+    """
+    Describe a policy's command, permissiveness & roles as given by expected_policy() or fetched, eg "FOR SELECT AS
+    PERMISSIVE TO public".
+    """
+    _, _, command, permissive, roles = policy
+    kind = "PERMISSIVE" if permissive else "RESTRICTIVE"
+    return f"FOR {command} AS {kind} TO {', '.join(roles)}"
+
+
+def fetch_policies(cursor, table_names):
+    """
+    Fetch the policies for all the given tables in a single query as a dict of table name to {policy name: (using,
+    check, command, permissive, roles)}, tables that don't exist are absent.
+    """
+    cursor.execute(
+        f"""
+        SELECT t.name, {POLICY_COLUMNS}
+        FROM unnest(%s::text[]) AS t(name)
+        JOIN pg_class c ON c.oid = to_regclass(quote_ident(t.name))
+        LEFT JOIN pg_policy p ON p.polrelid = c.oid
+        """,
+        [list(table_names)],
+    )
+    policies = {}
+    for table_name, name, *policy in cursor.fetchall():
+        table_policies = policies.setdefault(table_name, {})
+        if name is not None:
+            table_policies[name] = catalog_policy(*policy)
+    return policies
+
+
+def fetch_rls_catalog(cursor, table_names, schema=None):
+    """
+    Fetch the RLS status & policies of all the given tables, in schema or else on the search path, in a single query
+    as a dict of table name to (enabled, forced, active, {policy name: (using, check, command, permissive, roles)}),
+    tables that don't exist are absent.
+    """
+    if schema is None:
+        regclass = "to_regclass(quote_ident(t.name))"
+        params = [list(table_names)]
+    else:
+        regclass = "to_regclass(quote_ident(%s) || '.' || quote_ident(t.name))"
+        params = [list(table_names), schema]
+    cursor.execute(
+        f"""
+        SELECT
+            t.name, c.relrowsecurity, c.relforcerowsecurity, row_security_active(c.oid),
+            coalesce(
+                json_agg(json_build_array({POLICY_COLUMNS})) FILTER (WHERE p.oid IS NOT NULL),
+                '[]'
+            )
+        FROM unnest(%s::text[]) AS t(name)
+        JOIN pg_class c ON c.oid = {regclass}
+        LEFT JOIN pg_policy p ON p.polrelid = c.oid
+        GROUP BY t.name, c.oid
+        """,
+        params,
+    )
+    catalog = {}
+    for table_name, enabled, forced, active, policies in cursor.fetchall():
+        if isinstance(policies, str):
+            policies = json.loads(policies)
+        catalog[table_name] = (
+            enabled,
+            forced,
+            active,
+            {name: catalog_policy(*policy) for name, *policy in policies},
+        )
+    return catalog
+
+
+def fetch_schemas(cursor):
+    """
+    Fetch the names of the schemas other than the system schemas.
+    """
+    cursor.execute(
+        """
+        SELECT nspname FROM pg_namespace
+        WHERE nspname NOT LIKE 'pg\\_%%' AND nspname <> 'information_schema'
+        ORDER BY nspname
+        """
+    )
+    return [schema for schema, in cursor.fetchall()]
+
+
+def list_schemas(alias):
+    """
+    Return fetch_schemas() for the database, closing the connection afterwards, eg when run in a thread per database.
+    """
+    try:
+        with connections[alias].cursor() as cursor:
+            return fetch_schemas(cursor)
+    finally:
+        connections[alias].close()
+
+
+def diff_policies(models, expected, actual):
+    """
+    Compare expected policies, a dict of table name to {policy name: expected_policy()}, against those fetched with
+    fetch_policies().
+    """
+    drift = []
+    for table_name, expected_policies in expected.items():
+        if table_name not in actual:
+            # yet to be migrated
+            continue
+        model = models[table_name]
+        actual_policies = actual[table_name]
+        for name, policy in expected_policies.items():
+            if name not in actual_policies:
+                drift.append(PolicyDrift(model, name, "missing", policy, None))
+                continue
+            using, check, *scope = policy
+            actual_using, actual_check, *actual_scope = actual_policies[name]
+            if (
+                normalise_expression(using, table_name)
+                != normalise_expression(actual_using, table_name)
+                or normalise_expression(check, table_name)
+                != normalise_expression(actual_check, table_name)
+                or scope != actual_scope
+            ):
+                drift.append(
+                    PolicyDrift(model, name, "changed", policy, actual_policies[name])
                 )
+        for name, policy in actual_policies.items():
+            if name not in expected_policies:
+                drift.append(PolicyDrift(model, name, "extra", None, policy))
+    return drift
+
+
+def get_policy_drift(models, using=DEFAULT_DB_ALIAS):
+    models = {
+        model._meta.db_table: model
+        for model in models
+        if getattr(model._meta, "db_rls", False)
+        or getattr(model._meta, "db_rls_policies", None)
+    }
+    if not models:
+        return []
 
+    expected = {}
+    for table_name, model in models.items():
+        expected[table_name] = {}
+        for policy in getattr(model._meta, "db_rls_policies", []):
+            policy.compile(model)
+            expected[table_name][policy.name] = expected_policy(policy)
+
+    actual = cached_fetch(
+        using,
+        "policy_catalog",
+        list(models),
+        lambda cursor: fetch_policies(cursor, models),
+    )
+
+    return diff_policies(models, expected, actual)
+
+
+def check_rls_policies_in_sync(app_configs, databases=None, **kwargs):
+    if databases is None or DEFAULT_DB_ALIAS not in databases:
+        return []
+    if app_configs:
+        models = [
+            model for app_config in app_configs for model in app_config.get_models()
+        ]
+    else:
+        models = apps.get_models()
+
+    messages = {
+        "missing": ("Policy '{name}' is missing from table '{table}'.", "W002"),
+        "extra": (
+            "Policy '{name}' on table '{table}' is not in db_rls_policies.",
+            "W003",
+        ),
+        "changed": (
+            "Policy '{name}' on table '{table}' differs from db_rls_policies.",
+            "W004",
+        ),
+    }
+    errors = []
+    for drift in get_policy_drift(models):
+        message, id = messages[drift.kind]
+        errors.append(
+            Warning(
+                message.format(name=drift.name, table=drift.model._meta.db_table),
+                hint="Run makemigrations & migrate to bring policies in sync.",
+                obj=drift.model,
+                id=f"django_db_rls.{id}",
+            )
+        )
+    return errors
+
+
+IndexAdvice = namedtuple("IndexAdvice", ["model", "policy", "table_model", "index"])
+
+# lookups a btree index can serve, isnull is left out as it's rarely selective
+INDEXABLE_LOOKUPS = {"exact", "in", "gt", "gte", "lt", "lte", "range"}
+
+
+def unwrap(node):
+    # conditional expressions, eg Exists, are filtered as "expression = true"
+    if (
+        isinstance(node, Exact)
+        and node.rhs is True
+        and getattr(node.lhs, "conditional", False)
+    ):
+        return node.lhs
+    return node
+
+
+def predicate_column(node):
+    """
+    Return the (model, column) that a leaf predicate could be served by an index on, if any.
+    """
+    node = unwrap(node)
+    if isinstance(node, Lookup) and node.lookup_name in INDEXABLE_LOOKUPS:
+        col = node.lhs
+        if isinstance(node.rhs, Col) and node.rhs.alias == col.alias:
+            # compared against the same row
+            return None
+    elif isinstance(node, InAppGroups):
+        col = node.get_source_expressions()[0]
+    else:
+        return None
+    if not isinstance(col, Col) or isinstance(col.target, BooleanField):
+        return None
+    return col.target.model, col.target.column
+
+
+def index_requirements(node, tables):
+    """
+    Yield (model, columns) for each table scanned by the compiled policy where at least one of the columns must be
+    indexed for the scan to use an index: one for the predicates of each table ANDed together, for each branch of an
+    OR and for the join paths & predicates of subqueries.
+    """
+    node = unwrap(node)
+    if isinstance(node, Exists):
+        query = node.query
+        for join in query.alias_map.values():
+            if isinstance(join, Join) and join.table_name in tables:
+                for _, child_column in join.join_cols:
+                    yield tables[join.table_name], (child_column,)
+        yield from index_requirements(query.where, tables)
+    elif isinstance(node, WhereNode):
+        if node.negated:
+            return
+        if node.connector != AND:
+            for child in node.children:
+                yield from index_requirements(child, tables)
+            return
+        columns = {}
+        for child in node.children:
+            predicate = predicate_column(child)
+            if predicate is not None:
+                model, column = predicate
+                columns.setdefault(model, []).append(column)
+        for model, model_columns in columns.items():
+            yield model, tuple(dict.fromkeys(model_columns))
+        for child in node.children:
+            if isinstance(unwrap(child), Exists) or (
+                isinstance(child, WhereNode) and not columns
+            ):
+                # an index on any of this node's predicates serves the nested ones
+                yield from index_requirements(child, tables)
+    else:
+        predicate = predicate_column(node)
+        if predicate is not None:
+            model, column = predicate
+            yield model, (column,)
+
+
+def declared_index_columns(model):
+    """
+    Return the leading columns of the indexes declared by the model: primary key, unique & db_index fields (including
+    foreign keys), unique_together, Meta.indexes & unique constraints.
+    """
+    opts = model._meta
+    columns = set()
+    for field in opts.local_concrete_fields:
+        if field.primary_key or field.unique or field.db_index:
+            columns.add(field.column)
+    fields = [fields[0] for fields in opts.unique_together]
+    for index in [*opts.indexes, *opts.constraints]:
+        if isinstance(index, (Index, UniqueConstraint)) and index.fields:
+            fields.append(index.fields[0].lstrip("-"))
+    columns.update(opts.get_field(field).column for field in fields)
+    return columns
+
+
+def fetch_index_columns(cursor, table_names):
+    """
+    Fetch the leading columns of the indexes on the given tables in a single query as a dict of table name to set of
+    columns.
+    """
+    cursor.execute(
+        """
+        SELECT t.name, a.attname
+        FROM unnest(%s::text[]) AS t(name)
+        JOIN pg_index i ON i.indrelid = to_regclass(quote_ident(t.name))
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        """,
+        [list(table_names)],
+    )
+    columns = {}
+    for table_name, column in cursor.fetchall():
+        columns.setdefault(table_name, set()).add(column)
+    return columns
+
+
+def suggest_index(model, columns):
+    fields = {field.column: field.name for field in model._meta.concrete_fields}
+    index = Index(fields=[fields[column] for column in columns])
+    index.set_name_with_model(model)
+    return index
+
+
+def get_index_advice(models, using=DEFAULT_DB_ALIAS):
+    """
+    Analyse the USING expressions of the models' db_rls_policies for predicates & join paths not served by an index,
+    either declared on the model or present in the database, suggesting a models.Index for each.
+
+    Policies given as SQL strings can't be analysed and are skipped.
+    """
+    # avoid importing the user model while the app registry is populated
+    from django_db_rls.policy import build_where, evaluate
+
+    models = [
+        model for model in models if getattr(model._meta, "db_rls_policies", None)
+    ]
+    if not models:
+        return []
+
+    tables = {
+        model._meta.db_table: model
+        for model in apps.get_models(include_auto_created=True)
+    }
+    requirements = []
+    for model in models:
+        for policy in model._meta.db_rls_policies:
+            expression = evaluate(policy.using_expression)
+            if expression is None or isinstance(expression, str):
+                continue
+            policy.compile(model)
+            _, where = build_where(expression, model)
+            for table_model, columns in index_requirements(where, tables):
+                requirements.append((model, policy, table_model, columns))
+
+    table_names = {table_model._meta.db_table for _, _, table_model, _ in requirements}
+    indexed = cached_fetch(
+        using,
+        "index_columns",
+        list(table_names),
+        lambda cursor: fetch_index_columns(cursor, table_names),
+    )
+
+    advice = []
+    seen = set()
+    for model, policy, table_model, columns in requirements:
+        key = (model, policy.name, table_model, columns)
+        if key in seen:
+            continue
+        seen.add(key)
+        table_indexed = declared_index_columns(table_model) | indexed.get(
+            table_model._meta.db_table, set()
+        )
+        if table_indexed.isdisjoint(columns):
+            advice.append(
+                IndexAdvice(
+                    model, policy, table_model, suggest_index(table_model, columns)
+                )
+            )
+    return advice
+
+
+def check_rls_policy_indexes(app_configs, databases=None, **kwargs):
+    if databases is None or DEFAULT_DB_ALIAS not in databases:
+        return []
+    if app_configs:
+        models = [
+            model for app_config in app_configs for model in app_config.get_models()
+        ]
+    else:
+        models = apps.get_models()
+
+    errors = []
+    for advice in get_index_advice(models):
+        index = advice.index
+        errors.append(
+            Warning(
+                f"Policy '{advice.policy.name}' on table '{advice.model._meta.db_table}' filters table "
+                f"'{advice.table_model._meta.db_table}' on columns without an index, queries will use a sequential "
+                f"scan.",
+                hint=(
+                    f"Add models.Index(fields={index.fields!r}, name={index.name!r}) to "
+                    f"{advice.table_model._meta.label}.Meta.indexes."
+                ),
+                obj=advice.model,
+                id="django_db_rls.W006",
+            )
+        )
     return errors
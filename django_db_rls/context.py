@@ -0,0 +1,242 @@
+import re
+import sys
+from contextlib import ContextDecorator
+from functools import cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from django_db_rls.db_utils import ConfigMarker, config_value, get_config_cache
+from django_db_rls.metrics import timed
+
+# custom params must be namespaced and are interpolated into GRANT SET ON PARAMETER & prefix_config resets
+PARAM = re.compile(r"^[A-Za-z_]\w*(\.[A-Za-z_]\w*)+$")
+
+# claim name -> param
+CLAIMS = {
+    "is_superuser": "app.is_superuser",
+    "group_ids": "app.group_ids",
+}
+
+
+def get_claims():
+    claims = getattr(settings, "DB_RLS_CLAIMS", ())
+    for claim in claims:
+        if claim not in CLAIMS:
+            raise ImproperlyConfigured(
+                f"Unknown claim {claim!r} in DB_RLS_CLAIMS, choices are: {', '.join(CLAIMS)}"
+            )
+    return claims
+
+
+@cache
+def load_provider(provider):
+    return import_string(provider) if isinstance(provider, str) else provider
+
+
+def get_providers():
+    """
+    Return the DB_RLS_CONTEXT providers keyed by param, eg:
+
+        DB_RLS_CONTEXT = {
+            "app.tenant": "myapp.rls.tenant_id",
+        }
+
+    where each provider is a callable (or dotted path to one) taking the user & request, which is None outside of a
+    request.
+    """
+    providers = getattr(settings, "DB_RLS_CONTEXT", {})
+    for param in providers:
+        if not PARAM.match(param):
+            raise ImproperlyConfigured(
+                f"Invalid param {param!r} in DB_RLS_CONTEXT, must be namespaced like 'app.tenant'"
+            )
+    return {param: load_provider(provider) for param, provider in providers.items()}
+
+
+def get_params():
+    """
+    Return all params that may be set by user_context().
+    """
+    return [
+        "app.user",
+        *(CLAIMS[claim] for claim in get_claims()),
+        *get_providers(),
+    ]
+
+
+def get_group_ids(user):
+    """
+    Return the pks of the user's groups, taken from groups prefetched with prefetch_related("groups") if any,
+    otherwise queried, eg to avoid a query per user with principals_in_context(User.objects.prefetch_related("groups")).
+    """
+    prefetched = getattr(user, "_prefetched_objects_cache", {})
+    if "groups" in prefetched:
+        return sorted(group.pk for group in prefetched["groups"])
+    return sorted(user.groups.values_list("pk", flat=True))
+
+
+def user_context(user, request=None):
+    """
+    Return the params to set for the user: app.user along with any precomputed claims enabled with DB_RLS_CLAIMS so
+    that policies can compare against them rather than join back to the user's tables on each row, and any params
+    provided by DB_RLS_CONTEXT.
+
+    The group_ids claim costs a query for the user's groups unless they're prefetched, see get_group_ids().
+    """
+    context = {"app.user": user.pk}
+    claims = get_claims()
+    if "is_superuser" in claims:
+        context["app.is_superuser"] = "true" if user.is_superuser else "false"
+    if "group_ids" in claims:
+        group_ids = get_group_ids(user)
+        context["app.group_ids"] = "{" + ",".join(map(str, group_ids)) + "}"
+    for param, provider in get_providers().items():
+        context[param] = provider(user, request)
+    return context
+
+
+class rls_context(ContextDecorator):
+    """
+    Switch to the context of another user and/or params within a savepoint, restoring the previous values on exit.
+    Unlike set_config() this may change values already set in the transaction, eg to process many users in one
+    transaction:
+
+        with transaction.atomic():
+            for user in users:
+                with rls_context(user=user):
+                    ...
+
+    Also usable as a decorator. Opens a transaction if not already in one. With savepoint=False, like atomic(), an
+    error rolls back the enclosing transaction rather than only the context, saving the SAVEPOINT & RELEASE round
+    trips.
+    """
+
+    def __init__(self, user=None, params=None, savepoint=True):
+        self.user = user
+        self.params = params or {}
+        self.savepoint = savepoint
+        # (atomic, markers, previous) for each entry, allowing reentrance
+        self.stack = []
+
+    def __enter__(self):
+        context = {} if self.user is None else user_context(self.user)
+        context.update(self.params)
+        # stored as set_configs() would so that set_config() with the same value within is a no-op
+        context = {param: config_value(value) for param, value in context.items()}
+        atomic = transaction.atomic(savepoint=self.savepoint)
+        atomic.__enter__()
+        try:
+            previous = switch_configs(context)
+        except BaseException:
+            atomic.__exit__(*sys.exc_info())
+            raise
+        markers = [ConfigMarker(param, value) for param, value in context.items()]
+        for marker in markers:
+            connection.on_commit(marker)
+        self.stack.append((atomic, markers, previous))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        atomic, markers, previous = self.stack.pop()
+        # when rolling back to the savepoint there's no need to restore
+        if exc_type is None and not connection.needs_rollback:
+            try:
+                switch_configs(previous)
+                # Drop the markers so that the cache reflects the previous values again, leaving the list of markers
+                # the same size no matter how many contexts are switched in the transaction. (Rolling back to the
+                # savepoint on error restores both the values and the markers.)
+                connection.run_on_commit = [
+                    item for item in connection.run_on_commit if item[1] not in markers
+                ]
+            except BaseException:
+                atomic.__exit__(*sys.exc_info())
+                raise
+        atomic.__exit__(exc_type, exc_value, traceback)
+
+
+def switch_configs(configs):
+    """
+    Set the params regardless of their current values, returning the previous values in a single statement.
+    """
+    configs = {param: config_value(value) for param, value in configs.items()}
+    if not configs:
+        return {}
+    columns = ", ".join(
+        "current_setting(%s, true), set_config(%s, %s, true)" for _ in configs
+    )
+    with timed("django_db_rls.switch_configs"), connection.cursor() as cursor:
+        cursor.execute(
+            f"select {columns}",
+            [arg for param, value in configs.items() for arg in (param, param, value)],
+        )
+        row = cursor.fetchone()
+    previous = dict(zip(configs, row[::2]))
+    # lazy values may not have been applied yet
+    cache = get_config_cache()
+    return {param: cache.get(param, value) for param, value in previous.items()}
+
+
+class principals_in_context:
+    """
+    Iterate a queryset of users (principals) with each one's context applied, see rls_context(). Each chunk is
+    processed in a single transaction with a savepoint for each principal, unless savepoint=False:
+
+        with principals_in_context(User.objects.filter(is_active=True)) as principals:
+            for user in principals:
+                process(user)
+
+    Leaving the block ends the transaction there & then: the principals processed so far are committed, including
+    after a break, while an exception rolls back the principal being processed (or the chunk with savepoint=False)
+    before propagating.
+    """
+
+    def __init__(self, queryset, chunk_size=1000, savepoint=True):
+        self.queryset = queryset.order_by("pk")
+        self.chunk_size = chunk_size
+        self.savepoint = savepoint
+        self.stopping = False
+
+    def __enter__(self):
+        self.principals = self.iterate()
+        return self.principals
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # resume the generator, suspended within the transaction, so that it ends the transaction now
+        self.stopping = True
+        try:
+            if exc_type is None:
+                next(self.principals, None)
+            else:
+                self.principals.throw(exc_value)
+        except StopIteration:
+            pass
+        except BaseException as e:
+            if e is not exc_value:
+                raise
+        return False
+
+    def iterate(self):
+        last_pk = None
+        while not self.stopping:
+            chunk = (
+                self.queryset
+                if last_pk is None
+                else self.queryset.filter(pk__gt=last_pk)
+            )
+            chunk = list(chunk[: self.chunk_size])
+            if not chunk:
+                return
+            with transaction.atomic():
+                for principal in chunk:
+                    try:
+                        with rls_context(user=principal, savepoint=self.savepoint):
+                            yield principal
+                    except Exception:
+                        # rolled back by rls_context(), re-raised by __exit__() once the chunk is committed
+                        break
+                    if self.stopping:
+                        break
+            last_pk = chunk[-1].pk
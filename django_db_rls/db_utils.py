@@ -1,80 +1,595 @@
-from django.db import connection
+import logging
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    OperationalError,
+    connection,
+    connections,
+    transaction,
+)
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.db.migrations.exceptions import IrreversibleError
 from django.db.migrations.operations.base import Operation, OperationCategory
-from django.db.models import Func, IntegerField
+from django.db.models import BooleanField, Func, IntegerField, TextField, Value
+from django.utils.functional import cached_property
 
+from django_db_rls.metrics import incr, timed
 
-def set_config(param, value):
-    if not connection.in_atomic_block:
+logger = logging.getLogger("django_db_rls")
+
+
+class ConfigMarker:
+    """
+    A no-op on_commit() callback recording a value set with set_config().
+
+    Django discards on_commit() callbacks on commit, rollback and savepoint rollback which is exactly the lifetime of
+    set_config(..., is_local=true) so the markers double as a per-transaction cache of what has been set.
+    """
+
+    def __init__(self, param, value, applied=True):
+        self.param = param
+        self.value = value
+        self.applied = applied
+
+    def __call__(self):
+        pass
+
+
+def get_config_markers(conn=connection):
+    markers = {}
+    for _, func, _ in conn.run_on_commit:
+        if isinstance(func, ConfigMarker):
+            markers[func.param] = func
+    return markers
+
+
+def get_config_cache(using=DEFAULT_DB_ALIAS):
+    """
+    Return the values set with set_config() in the current transaction, keyed by param.
+    """
+    return {
+        param: marker.value
+        for param, marker in get_config_markers(connections[using]).items()
+    }
+
+
+def config_value(value):
+    """
+    Return the value as set_config() stores it, so that values from any path compare equal, eg a pk & its string.
+    """
+    return "" if value is None else str(value)
+
+
+def set_config(param, value, lazy=False, using=DEFAULT_DB_ALIAS):
+    """
+    Set param for the remainder of the current transaction.
+
+    With lazy=True no statement is run, instead the set_config() call is prefixed onto the next statement by the
+    prefix_config execute wrapper, which must be installed.
+    """
+    set_configs({param: value}, lazy=lazy, using=using)
+
+
+def set_configs(configs, lazy=False, using=DEFAULT_DB_ALIAS, read_only=False):
+    """
+    Like set_config() but for a mapping of params to values, all set with a single statement.
+
+    With read_only=True the transaction is also made read-only in the same statement.
+    """
+    conn = connections[using]
+    if not conn.in_atomic_block:
         raise RuntimeError("Must be within atomic")
 
-    with connection.cursor() as cursor:
-        if value is None or value == "":
-            cursor.execute("select set_config(%s, '', true)", [param])
-            return
-
-        cursor.execute("select current_setting(%s, true)", [param])
-        curr_value = cursor.fetchone()[0]
-        if curr_value == str(value):
-            return
-        elif curr_value is None or curr_value == "":
-            cursor.execute("select set_config(%s, %s, true)", [param, str(value)])
-        else:
+    cache = get_config_cache(using)
+    changed = {}
+    for param, value in configs.items():
+        value = config_value(value)
+        cached = cache.get(param)
+        if cached == value:
+            continue
+        elif cached and value != "":
             raise RuntimeError("Cannot change config within another config")
+        changed[param] = value
+    # conditions are only for changed context, this is set regardless
+    unconditional = {}
+    if read_only and cache.get("transaction_read_only") != "on":
+        unconditional["transaction_read_only"] = "on"
+    values = {**changed, **unconditional}
+    if not values:
+        return
+
+    if lazy:
+        if prefix_config not in conn.execute_wrappers:
+            raise RuntimeError(
+                "Lazy set_config() requires the prefix_config execute wrapper"
+            )
+        for param, value in values.items():
+            conn.on_commit(ConfigMarker(param, value, applied=False))
+        incr("django_db_rls.set_config.lazy", using=using)
+        return
+
+    # Only set if unset or already the same value to avoid another round trip for current_setting(), clearing is
+    # always allowed
+    conditions = []
+    condition_params = []
+    for param, value in changed.items():
+        if value != "":
+            conditions.append("coalesce(current_setting(%s, true), '') in ('', %s)")
+            condition_params += [param, value]
+    setters = ", ".join("set_config(%s, %s, true)" for _ in values)
+    setter_params = [arg for item in values.items() for arg in item]
+    with timed("django_db_rls.set_config", using=using), conn.cursor() as cursor:
+        if conditions:
+            cursor.execute(
+                f"select case when {' and '.join(conditions)} then array[{setters}] end",
+                [*condition_params, *setter_params],
+            )
+            if cursor.fetchone()[0] is None:
+                raise RuntimeError("Cannot change config within another config")
+        else:
+            cursor.execute(f"select {setters}", setter_params)
+
+    for param, value in values.items():
+        conn.on_commit(ConfigMarker(param, value))
+
+
+class ResetMarker:
+    """
+    A no-op on_commit() callback recording that prefix_config has reset the params for the transaction, see
+    ConfigMarker.
+    """
+
+    def __call__(self):
+        pass
+
+
+def use_pool_safe():
+    return getattr(settings, "DB_RLS_POOL_SAFE", False)
+
+
+def prefix_config(execute, sql, params, many, context):
+    """
+    Execute wrapper that prepends pending lazy set_config() calls onto the statement being executed, saving the round
+    trip for a separate statement.
+
+        with connection.execute_wrapper(prefix_config):
+            set_config("app.user", user.pk, lazy=True)
+
+    With DB_RLS_POOL_SAFE it's installed on every connection and also resets the params for the remainder of the
+    first transaction in which they are used, so that a value set at the session level (eg by SET) can't leak between
+    checkouts from a pool or PgBouncer. Stale values found are logged (psycopg3 only).
+    """
+    conn = context["connection"]
+    if getattr(conn, "in_prefix_config", False):
+        # the prefix itself, when run as a separate statement below
+        return execute(sql, params, many, context)
+    markers = get_config_markers(conn)
+    pending = [marker for marker in markers.values() if not marker.applied]
+    reset = []
+    if use_pool_safe() and not any(
+        isinstance(func, ResetMarker) for _, func, _ in conn.run_on_commit
+    ):
+        from django_db_rls.context import get_params
+
+        reset = [param for param in get_params() if param not in markers]
+    if not pending and not reset:
+        return execute(sql, params, many, context)
+
+    # reset params are validated identifiers so may be inlined, leaving a statement without params free of
+    # placeholder conversion
+    prefix = "select " + ", ".join(
+        [
+            *(
+                f"current_setting('{param}', true), set_config('{param}', '', true)"
+                for param in reset
+            ),
+            *("set_config(%s, %s, true)" for _ in pending),
+        ]
+    )
+    prefix_params = [arg for marker in pending for arg in (marker.param, marker.value)]
+
+    # Record as applied at the current savepoint level so that rolling back to a savepoint restores the pending values
+    for marker in pending:
+        conn.on_commit(ConfigMarker(marker.param, marker.value))
+    # Outside of a transaction each statement is its own, so must be reset each time
+    if reset and conn.in_atomic_block:
+        conn.on_commit(ResetMarker())
+
+    cursor = context["cursor"]
+    if (
+        many
+        or isinstance(params, dict)
+        # server-side cursors and bindings can't run multiple statements
+        or getattr(cursor.cursor, "name", None)
+        or conn.settings_dict["OPTIONS"].get("server_side_binding")
+    ):
+        # Outside of a transaction the reset must share one with the statement to apply to it
+        atomic = (
+            nullcontext()
+            if conn.in_atomic_block
+            else transaction.atomic(using=conn.alias)
+        )
+        with atomic:
+            conn.in_prefix_config = True
+            try:
+                with conn.cursor() as prefix_cursor:
+                    prefix_cursor.execute(prefix, prefix_params or None)
+                    if reset:
+                        log_stale(reset, prefix_cursor.fetchone())
+            finally:
+                conn.in_prefix_config = False
+            return execute(sql, params, many, context)
+
+    if params is None and not prefix_params:
+        result = execute(f"{prefix}; {sql}", None, many, context)
+    else:
+        if params is None:
+            # no params means no interpolation, escape any literal %
+            sql = sql.replace("%", "%%")
+            params = ()
+        result = execute(f"{prefix}; {sql}", [*prefix_params, *params], many, context)
+    if is_psycopg3:
+        # psycopg2 returns the results of the last statement whereas psycopg3 must be advanced
+        if reset:
+            log_stale(reset, cursor.cursor.fetchone())
+        cursor.cursor.nextset()
+    return result
+
+
+def log_stale(params, row):
+    for param, value in zip(params, row[::2]):
+        if value:
+            logger.warning("Reset stale value of %s left set on the connection", param)
+
+
+def install_prefix_config(sender, connection, **kwargs):
+    """
+    connection_created receiver installing prefix_config on every postgres connection, see DB_RLS_POOL_SAFE.
+    """
+    if (
+        connection.vendor == "postgresql"
+        and prefix_config not in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(prefix_config)
 
 
 class AppUser(Func):
+    # doesn't vary by row, see InitPlan
+    contextual = True
     template = "nullif(current_setting('app.user', true), '')::int"
     output_field = IntegerField()
 
 
-def enable_rls(schema_editor, model):
-    table = schema_editor.quote_name(model._meta.db_table)
-    schema_editor.execute(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY")
-    force_rls(schema_editor, model)
+class CurrentSetting(Func):
+    """
+    The value of a param set with set_config(), eg from DB_RLS_CONTEXT, cast to the output_field:
+
+        Policy(using=Q(tenant=CurrentSetting("app.tenant", IntegerField())))
+    """
+
+    contextual = True
+    template = "nullif(current_setting(%(expressions)s, true), '')::%(db_type)s"
 
+    def __init__(self, param, output_field=None, **extra):
+        super().__init__(
+            Value(param), output_field=output_field or TextField(), **extra
+        )
 
-def disable_rls(schema_editor, model):
+    def as_sql(self, compiler, connection, **extra_context):
+        extra_context["db_type"] = self.output_field.cast_db_type(connection)
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+class AppIsSuperuser(Func):
+    """
+    The app.is_superuser claim, see DB_RLS_CLAIMS.
+    """
+
+    contextual = True
+    template = "coalesce(nullif(current_setting('app.is_superuser', true), '')::boolean, false)"
+    output_field = BooleanField()
+
+
+class AppGroupIds(Func):
+    """
+    The app.group_ids claim, see DB_RLS_CLAIMS.
+    """
+
+    contextual = True
+    template = (
+        "coalesce(nullif(current_setting('app.group_ids', true), '')::int[], '{}')"
+    )
+    output_field = ArrayField(IntegerField())
+
+
+class InAppGroups(Func):
+    """
+    Whether the expression, eg a group foreign key, is one of the app.group_ids claim.
+
+        Policy(using=InAppGroups("group"))
+    """
+
+    template = "%(expressions)s)"
+    arg_joiner = " = ANY("
+    output_field = BooleanField()
+
+    def __init__(self, expression, **extra):
+        super().__init__(expression, AppGroupIds(), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        if not isinstance(self.source_expressions[1], AppGroupIds):
+            # wrapped in a scalar subquery by DB_RLS_OPTIMIZE_POLICIES, which ANY() would take as a set of rows
+            extra_context["template"] = "%(expressions)s::int[])"
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+class TableLockMarker:
+    """
+    A no-op on_commit() callback recording that DDL has locked a table for the rest of the transaction, see
+    ConfigMarker.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def __call__(self):
+        pass
+
+
+def is_lock_not_available(error):
+    cause = error.__cause__
+    # psycopg3 or psycopg2
+    return getattr(cause, "sqlstate", getattr(cause, "pgcode", None)) == "55P03"
+
+
+def execute_ddl(
+    schema_editor, model, sql, lock_timeout=None, lock_retries=None, policy=None
+):
+    """
+    Execute DDL on the model's table, optionally with a lock_timeout so that it doesn't queue up behind long running
+    queries (and everything else behind it) and retried a bounded number of times if the lock can't be acquired.
+
+    Defaults to the DB_RLS_LOCK_TIMEOUT & DB_RLS_LOCK_RETRIES settings. The policy name, if any, tags the metrics.
+    """
+    if lock_timeout is None:
+        lock_timeout = getattr(settings, "DB_RLS_LOCK_TIMEOUT", None)
+    if lock_retries is None:
+        lock_retries = getattr(settings, "DB_RLS_LOCK_RETRIES", 3)
+
+    conn = schema_editor.connection
+    table = model._meta.db_table
+    already_locked = any(
+        isinstance(func, TableLockMarker) and func.table == table
+        for _, func, _ in conn.run_on_commit
+    )
+
+    tags = {"model": model._meta.label, "policy": policy}
+    # sql has literals inlined, pass None for params to prevent interpolation of any %
+    if lock_timeout is None or schema_editor.collect_sql or already_locked:
+        with timed("django_db_rls.ddl", **tags):
+            schema_editor.execute(sql, None)
+    else:
+        for attempt in range(lock_retries + 1):
+            try:
+                # a savepoint to retry within the migration's transaction
+                with (
+                    timed("django_db_rls.ddl", **tags),
+                    transaction.atomic(using=conn.alias),
+                ):
+                    with conn.cursor() as cursor:
+                        cursor.execute(
+                            "SELECT current_setting('lock_timeout'), set_config('lock_timeout', %s, true)",
+                            [str(lock_timeout)],
+                        )
+                        previous = cursor.fetchone()[0]
+                    schema_editor.execute(sql, None)
+                    # restore any lock_timeout set by the migration or session, a failed attempt is rolled back to
+                    # the savepoint along with it
+                    with conn.cursor() as cursor:
+                        cursor.execute(
+                            "SELECT set_config('lock_timeout', %s, true)", [previous]
+                        )
+                break
+            except OperationalError as e:
+                if attempt == lock_retries or not is_lock_not_available(e):
+                    raise
+                incr("django_db_rls.ddl.lock_retry", **tags)
+                time.sleep(0.5 * 2**attempt)
+
+    if conn.in_atomic_block and not schema_editor.collect_sql:
+        # the lock is now held until the end of the transaction
+        conn.on_commit(TableLockMarker(table))
+
+
+def enable_rls(schema_editor, model, lock_timeout=None, lock_retries=None):
     table = schema_editor.quote_name(model._meta.db_table)
-    schema_editor.execute(f"ALTER TABLE {table} DISABLE ROW LEVEL SECURITY")
-    no_force_rls(schema_editor, model)
+    execute_ddl(
+        schema_editor,
+        model,
+        f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY, FORCE ROW LEVEL SECURITY",
+        lock_timeout,
+        lock_retries,
+    )
 
 
-def force_rls(schema_editor, model):
+def disable_rls(schema_editor, model, lock_timeout=None, lock_retries=None):
     table = schema_editor.quote_name(model._meta.db_table)
-    schema_editor.execute(f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY")
+    execute_ddl(
+        schema_editor,
+        model,
+        f"ALTER TABLE {table} DISABLE ROW LEVEL SECURITY, NO FORCE ROW LEVEL SECURITY",
+        lock_timeout,
+        lock_retries,
+    )
 
 
-def no_force_rls(schema_editor, model):
+def force_rls(schema_editor, model, lock_timeout=None, lock_retries=None):
     table = schema_editor.quote_name(model._meta.db_table)
-    schema_editor.execute(f"ALTER TABLE {table} NO FORCE ROW LEVEL SECURITY")
+    execute_ddl(
+        schema_editor,
+        model,
+        f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY",
+        lock_timeout,
+        lock_retries,
+    )
 
 
-def create_policy(schema_editor, policy_name, model, using, check):
+def no_force_rls(schema_editor, model, lock_timeout=None, lock_retries=None):
+    table = schema_editor.quote_name(model._meta.db_table)
+    execute_ddl(
+        schema_editor,
+        model,
+        f"ALTER TABLE {table} NO FORCE ROW LEVEL SECURITY",
+        lock_timeout,
+        lock_retries,
+    )
+
+
+def policy_roles(schema_editor, to):
+    if to is None:
+        return "PUBLIC"
+    return ", ".join(
+        "PUBLIC" if role.lower() == "public" else schema_editor.quote_name(role)
+        for role in to
+    )
+
+
+def policy_options(for_, as_restrictive, to):
+    """
+    Return the policy's options that differ from the defaults so that they're only serialized when given.
+    """
+    options = {
+        "for_": for_ if for_ != "ALL" else None,
+        "as_restrictive": as_restrictive or None,
+        "to": list(to) if to is not None else None,
+    }
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def create_policy(
+    schema_editor,
+    policy_name,
+    model,
+    using,
+    check,
+    lock_timeout=None,
+    lock_retries=None,
+    for_="ALL",
+    as_restrictive=False,
+    to=None,
+):
     table = schema_editor.quote_name(model._meta.db_table)
     policy = schema_editor.quote_name(policy_name)
-    sql = f"CREATE POLICY {policy} ON {table} USING ({using})"
+    sql = f"CREATE POLICY {policy} ON {table}"
+    if as_restrictive:
+        sql += " AS RESTRICTIVE"
+    if for_ != "ALL":
+        sql += f" FOR {for_}"
+    if to is not None:
+        sql += f" TO {policy_roles(schema_editor, to)}"
+    if using:
+        sql += f" USING ({using})"
     if check:
         sql += f" WITH CHECK ({check})"
-    schema_editor.execute(sql)
+    execute_ddl(
+        schema_editor, model, sql, lock_timeout, lock_retries, policy=policy_name
+    )
 
 
-def drop_policy(schema_editor, policy_name, model):
+def drop_policy(
+    schema_editor, policy_name, model, lock_timeout=None, lock_retries=None
+):
     table = schema_editor.quote_name(model._meta.db_table)
     policy = schema_editor.quote_name(policy_name)
-    schema_editor.execute(f"DROP POLICY IF EXISTS {policy} ON {table}")
-
-
-def alter_policy(schema_editor, policy_name, model, using, check):
+    execute_ddl(
+        schema_editor,
+        model,
+        f"DROP POLICY IF EXISTS {policy} ON {table}",
+        lock_timeout,
+        lock_retries,
+        policy=policy_name,
+    )
+
+
+def alter_policy(
+    schema_editor,
+    policy_name,
+    model,
+    using,
+    check,
+    lock_timeout=None,
+    lock_retries=None,
+    to=None,
+):
+    # only policies of the same policy_scope() can be altered, see RemovePolicy.reduce()
     table = schema_editor.quote_name(model._meta.db_table)
-    sql = f"ALTER POLICY {schema_editor.quote_name(policy_name)} ON {table} USING ({using})"
+    sql = f"ALTER POLICY {schema_editor.quote_name(policy_name)} ON {table}"
+    sql += f" TO {policy_roles(schema_editor, to)}"
+    if using:
+        sql += f" USING ({using})"
     if check:
         sql += f" WITH CHECK ({check})"
-    schema_editor.execute(sql)
+    execute_ddl(
+        schema_editor, model, sql, lock_timeout, lock_retries, policy=policy_name
+    )
+
+
+def policy_scope(policy):
+    """
+    Return what ALTER POLICY can't change for a Policy or policy operation: Postgres can alter a policy's roles &
+    expressions but not its command or permissiveness, nor remove a USING or WITH CHECK expression (as reversing adding
+    one would), so a policy differing in these must be dropped & recreated.
+    """
+    return (
+        policy.for_,
+        policy.as_restrictive,
+        policy.using is not None,
+        policy.check is not None,
+    )
+
+
+class RLSOperation(Operation):
+    """
+    Base for operations on a model's table that may be given a lock_timeout & lock_retries, see execute_ddl().
+    """
+
+    def __init__(self, model_name, lock_timeout=None, lock_retries=None):
+        self.model_name = model_name
+        self.lock_timeout = lock_timeout
+        self.lock_retries = lock_retries
 
+    @cached_property
+    def model_name_lower(self):
+        return self.model_name.lower()
 
-class AlterRLS(Operation):
-    def __init__(self, model_name, db_rls):
-        self.model_name = model_name
+    @property
+    def lock_options(self):
+        options = {"lock_timeout": self.lock_timeout, "lock_retries": self.lock_retries}
+        return {key: value for key, value in options.items() if value is not None}
+
+    def references_model(self, name, app_label):
+        return name.lower() == self.model_name_lower
+
+    def is_same_model(self, operation):
+        return (
+            isinstance(operation, RLSOperation)
+            and operation.model_name_lower == self.model_name_lower
+        )
+
+    def reduce(self, operation, app_label):
+        # allow operations on other models to be optimized across this one
+        return super().reduce(operation, app_label) or not operation.references_model(
+            self.model_name, app_label
+        )
+
+
+class AlterRLS(RLSOperation):
+    def __init__(self, model_name, db_rls, lock_timeout=None, lock_retries=None):
+        super().__init__(model_name, lock_timeout, lock_retries)
         self.db_rls = db_rls
         self.category = (
             OperationCategory.ADDITION if db_rls else OperationCategory.REMOVAL
@@ -87,13 +602,18 @@ class AlterRLS(Operation):
         to_model = to_state.apps.get_model(app_label, self.model_name)
 
         if getattr(to_model._meta, "db_rls", False):
-            enable_rls(schema_editor, to_model)
+            enable_rls(schema_editor, to_model, **self.lock_options)
         else:
-            disable_rls(schema_editor, to_model)
+            disable_rls(schema_editor, to_model, **self.lock_options)
 
     def database_backwards(self, app_label, schema_editor, from_state, to_state):
         self.database_forwards(app_label, schema_editor, from_state, to_state)
 
+    def reduce(self, operation, app_label):
+        if isinstance(operation, AlterRLS) and self.is_same_model(operation):
+            return [operation]
+        return super().reduce(operation, app_label)
+
     def describe(self):
         return ("Enable" if self.db_rls else "Disable") + " Row Level Security"
 
@@ -104,9 +624,9 @@ class AlterRLS(Operation):
         return f"{model_name}_{verb}_rls"
 
 
-class AlterForceRLS(Operation):
-    def __init__(self, model_name, db_rls_force):
-        self.model_name = model_name
+class AlterForceRLS(RLSOperation):
+    def __init__(self, model_name, db_rls_force, lock_timeout=None, lock_retries=None):
+        super().__init__(model_name, lock_timeout, lock_retries)
         self.db_rls_force = db_rls_force
         self.category = (
             OperationCategory.ADDITION if db_rls_force else OperationCategory.REMOVAL
@@ -121,31 +641,73 @@ class AlterForceRLS(Operation):
         to_model = to_state.apps.get_model(app_label, self.model_name)
 
         if getattr(to_model._meta, "db_rls_force", False):
-            force_rls(schema_editor, to_model)
+            force_rls(schema_editor, to_model, **self.lock_options)
         else:
-            no_force_rls(schema_editor, to_model)
+            no_force_rls(schema_editor, to_model, **self.lock_options)
 
     def database_backwards(self, app_label, schema_editor, from_state, to_state):
         self.database_forwards(app_label, schema_editor, from_state, to_state)
 
+    def reduce(self, operation, app_label):
+        if isinstance(operation, AlterForceRLS) and self.is_same_model(operation):
+            return [operation]
+        return super().reduce(operation, app_label)
+
     def describe(self):
-        return ("Force" if self.db_rls else "No Force") + " Row Level Security"
+        return ("Force" if self.db_rls_force else "No Force") + " Row Level Security"
 
     @property
     def migration_name_fragment(self):
         model_name = self.model_name.lower()
-        verb = "force" if self.db_rls else "no_force"
+        verb = "force" if self.db_rls_force else "no_force"
         return f"{model_name}_{verb}_rls"
 
 
-class AddPolicy(Operation):
-    category = OperationCategory.ADDITION
-
-    def __init__(self, model_name, name, using, check):
-        self.model_name = model_name
+class PolicyOperation(RLSOperation):
+    def __init__(
+        self,
+        model_name,
+        name,
+        using,
+        check,
+        lock_timeout=None,
+        lock_retries=None,
+        for_="ALL",
+        as_restrictive=False,
+        to=None,
+    ):
+        super().__init__(model_name, lock_timeout, lock_retries)
         self.name = name
         self.using = using
         self.check = check
+        self.for_ = for_
+        self.as_restrictive = as_restrictive
+        self.to = to
+
+    @property
+    def policy_options(self):
+        return policy_options(self.for_, self.as_restrictive, self.to)
+
+    def get_policy(self):
+        from django_db_rls.policy import Policy
+
+        return Policy(
+            using=self.using, check=self.check, name=self.name, **self.policy_options
+        )
+
+    def is_same_scope(self, operation):
+        return policy_scope(operation) == policy_scope(self)
+
+    def is_same_policy(self, operation):
+        return (
+            isinstance(operation, PolicyOperation)
+            and self.is_same_model(operation)
+            and operation.name == self.name
+        )
+
+
+class AddPolicy(PolicyOperation):
+    category = OperationCategory.ADDITION
 
     def state_forwards(self, app_label, state):
         # using this will require that db_rls_policies is already initialised as a []
@@ -155,9 +717,7 @@ class AddPolicy(Operation):
         #     "db_rls_policies",
         #     Policy(using=self.using, check=self.check, name=self.name),
         # )
-        from django_db_rls.policy import Policy
-
-        obj = Policy(using=self.using, check=self.check, name=self.name)
+        obj = self.get_policy()
         model_state = state.models[app_label, self.model_name]
         # xxx initialisation reqd here
         model_state.options.setdefault("db_rls_policies", [])
@@ -169,11 +729,36 @@ class AddPolicy(Operation):
 
     def database_forwards(self, app_label, schema_editor, from_state, to_state):
         to_model = to_state.apps.get_model(app_label, self.model_name)
-        create_policy(schema_editor, self.name, to_model, self.using, self.check)
+        create_policy(
+            schema_editor,
+            self.name,
+            to_model,
+            self.using,
+            self.check,
+            **self.lock_options,
+            **self.policy_options,
+        )
 
     def database_backwards(self, app_label, schema_editor, from_state, to_state):
         to_model = to_state.apps.get_model(app_label, self.model_name)
-        drop_policy(schema_editor, self.name, to_model)
+        drop_policy(schema_editor, self.name, to_model, **self.lock_options)
+
+    def reduce(self, operation, app_label):
+        if self.is_same_policy(operation):
+            if isinstance(operation, RemovePolicy):
+                return []
+            if isinstance(operation, AlterPolicy):
+                return [
+                    AddPolicy(
+                        self.model_name,
+                        self.name,
+                        operation.using,
+                        operation.check,
+                        **operation.lock_options,
+                        **operation.policy_options,
+                    )
+                ]
+        return super().reduce(operation, app_label)
 
     def describe(self):
         return f"Add Policy {self.name}"
@@ -183,25 +768,46 @@ class AddPolicy(Operation):
         return f"add_policy_{self.name}"
 
 
-class RemovePolicy(Operation):
+class RemovePolicy(PolicyOperation):
     category = OperationCategory.REMOVAL
 
-    def __init__(self, model_name, name, using, check):
-        self.model_name = model_name
-        self.name = name
-        self.using = using
-        self.check = check
-
     def state_forwards(self, app_label, state):
         state._remove_option(app_label, self.model_name, "db_rls_policies", self.name)
 
     def database_forwards(self, app_label, schema_editor, from_state, to_state):
         to_model = to_state.apps.get_model(app_label, self.model_name)
-        drop_policy(schema_editor, self.name, to_model)
+        drop_policy(schema_editor, self.name, to_model, **self.lock_options)
 
     def database_backwards(self, app_label, schema_editor, from_state, to_state):
         to_model = to_state.apps.get_model(app_label, self.model_name)
-        create_policy(schema_editor, self.name, to_model, self.using, self.check)
+        create_policy(
+            schema_editor,
+            self.name,
+            to_model,
+            self.using,
+            self.check,
+            **self.lock_options,
+            **self.policy_options,
+        )
+
+    def reduce(self, operation, app_label):
+        if (
+            self.is_same_policy(operation)
+            and isinstance(operation, AddPolicy)
+            and self.is_same_scope(operation)
+        ):
+            # dropping & recreating is an alter
+            return [
+                AlterPolicy(
+                    self.model_name,
+                    self.name,
+                    operation.using,
+                    operation.check,
+                    **operation.lock_options,
+                    **operation.policy_options,
+                )
+            ]
+        return super().reduce(operation, app_label)
 
     def describe(self):
         return f"Remove Policy {self.name}"
@@ -211,32 +817,60 @@ class RemovePolicy(Operation):
         return f"remove_policy_{self.name}"
 
 
-class AlterPolicy(Operation):
+class AlterPolicy(PolicyOperation):
     category = OperationCategory.ALTERATION
 
-    def __init__(self, model_name, name, using, check):
-        self.model_name = model_name
-        self.name = name
-        self.using = using
-        self.check = check
-
     def state_forwards(self, app_label, state):
-        from django_db_rls.policy import Policy
-
         state._alter_option(
             app_label,
             self.model_name,
             "db_rls_policies",
             self.name,
-            Policy(using=self.using, check=self.check, name=self.name),
+            self.get_policy(),
         )
 
     def database_forwards(self, app_label, schema_editor, from_state, to_state):
         to_model = to_state.apps.get_model(app_label, self.model_name)
-        alter_policy(schema_editor, self.name, to_model, self.using, self.check)
+        alter_policy(
+            schema_editor,
+            self.name,
+            to_model,
+            self.using,
+            self.check,
+            to=self.to,
+            **self.lock_options,
+        )
 
     def database_backwards(self, app_label, schema_editor, from_state, to_state):
-        self.database_forwards(app_label, schema_editor, from_state, to_state)
+        # revert to the policy as it was in the prior state
+        to_model = to_state.apps.get_model(app_label, self.model_name)
+        policy = next(
+            (
+                policy
+                for policy in getattr(to_model._meta, "db_rls_policies", [])
+                if policy.name == self.name
+            ),
+            None,
+        )
+        if policy is None:
+            raise IrreversibleError(
+                f"Cannot reverse Alter Policy {self.name} as the policy isn't in {self.model_name}'s prior state."
+            )
+        policy.compile(to_model)
+        alter_policy(
+            schema_editor,
+            self.name,
+            to_model,
+            policy.using,
+            policy.check,
+            to=policy.to,
+            **self.lock_options,
+        )
+
+    def reduce(self, operation, app_label):
+        if self.is_same_policy(operation) and isinstance(operation, AlterPolicy):
+            return [operation]
+        return super().reduce(operation, app_label)
 
     def describe(self):
         return f"Alter Policy {self.name}"
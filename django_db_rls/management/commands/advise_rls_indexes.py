@@ -0,0 +1,131 @@
+import json
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from django_db_rls.checks import get_index_advice
+from django_db_rls.context import user_context
+from django_db_rls.db_utils import set_configs
+
+
+def plan_scans(plan):
+    """
+    Yield each scan node of an EXPLAIN (FORMAT JSON) plan.
+    """
+    if "Relation Name" in plan:
+        yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_scans(child)
+
+
+class Command(BaseCommand):
+    help = "Report db_rls_policies filtering on columns without an index, suggesting indexes to add"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "app_label",
+            nargs="*",
+            help="Restrict to the given app labels.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            choices=tuple(connections),
+            help=('Nominates a database. Defaults to the "default" database.'),
+        )
+        parser.add_argument(
+            "--explain",
+            action="store_true",
+            help="Also EXPLAIN a query on each model under the context given by --user and/or --param.",
+        )
+        parser.add_argument(
+            "--user",
+            help="Primary key of the user to EXPLAIN as.",
+        )
+        parser.add_argument(
+            "--param",
+            action="append",
+            default=[],
+            metavar="PARAM=VALUE",
+            help="Param to set when EXPLAINing, eg app.tenant=1, may be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        if options["app_label"]:
+            models = [
+                model
+                for app_label in options["app_label"]
+                for model in apps.get_app_config(app_label).get_models()
+            ]
+        else:
+            models = apps.get_models()
+
+        using = options["database"]
+        advice = get_index_advice(models, using=using)
+        for item in advice:
+            index = item.index
+            self.stdout.write(
+                f"{item.model._meta.db_table}.{item.policy.name}: "
+                f"{item.table_model._meta.db_table}({', '.join(index.fields)}) is not indexed"
+            )
+            self.stdout.write(
+                f"  add to {item.table_model._meta.label}.Meta.indexes: "
+                f"models.Index(fields={index.fields!r}, name={index.name!r})"
+            )
+
+        if options["explain"]:
+            self.explain(models, using, options["user"], options["param"])
+
+        if advice:
+            raise CommandError(f"{len(advice)} policy predicates without an index")
+        self.stdout.write(self.style.SUCCESS("Policy predicates are indexed"))
+
+    def explain(self, models, using, user, params):
+        context = {}
+        if user is not None:
+            context.update(
+                user_context(
+                    get_user_model()._default_manager.using(using).get(pk=user)
+                )
+            )
+        for param in params:
+            name, sep, value = param.partition("=")
+            if not sep:
+                raise CommandError(f"Invalid --param {param!r}, expected PARAM=VALUE")
+            context[name] = value
+        if not context:
+            raise CommandError("--explain requires --user and/or --param")
+
+        models = [
+            model for model in models if getattr(model._meta, "db_rls_policies", None)
+        ]
+        # rolled back so that nothing is left behind
+        with transaction.atomic(using=using):
+            set_configs(context, using=using)
+            with connections[using].cursor() as cursor:
+                for model in models:
+                    sql, sql_params = (
+                        model._base_manager.using(using).all().query.sql_with_params()
+                    )
+                    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", sql_params)
+                    plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    table = model._meta.db_table
+                    for scan in plan_scans(plan[0]["Plan"]):
+                        index = scan.get("Index Name")
+                        line = (
+                            f"{table}: {scan['Node Type']} on {scan['Relation Name']}"
+                        )
+                        if index:
+                            line += f" using {index}"
+                        if scan["Node Type"] == "Seq Scan":
+                            self.stdout.write(self.style.WARNING(line))
+                            if "Filter" in scan:
+                                self.stdout.write(f"  filter: {scan['Filter']}")
+                        else:
+                            self.stdout.write(line)
+            transaction.set_rollback(True, using=using)
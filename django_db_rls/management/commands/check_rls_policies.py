@@ -0,0 +1,54 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from django_db_rls.checks import describe_scope, get_policy_drift
+
+
+class Command(BaseCommand):
+    help = "Compare models' db_rls_policies against the policies in the database"
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "app_label",
+            nargs="*",
+            help="Restrict to the given app labels.",
+        )
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            choices=tuple(connections),
+            help=('Nominates a database. Defaults to the "default" database.'),
+        )
+
+    def handle(self, *args, **options):
+        if options["app_label"]:
+            models = [
+                model
+                for app_label in options["app_label"]
+                for model in apps.get_app_config(app_label).get_models()
+            ]
+        else:
+            models = apps.get_models()
+
+        drift = get_policy_drift(models, using=options["database"])
+        for policy in drift:
+            table = policy.model._meta.db_table
+            self.stdout.write(f"{policy.kind}: {table}.{policy.name}")
+            if policy.expected:
+                self.stdout.write(f"  expected using: {policy.expected[0]}")
+                if policy.expected[1]:
+                    self.stdout.write(f"  expected check: {policy.expected[1]}")
+                self.stdout.write(
+                    f"  expected scope: {describe_scope(policy.expected)}"
+                )
+            if policy.actual:
+                self.stdout.write(f"  actual using:   {policy.actual[0]}")
+                if policy.actual[1]:
+                    self.stdout.write(f"  actual check:   {policy.actual[1]}")
+                self.stdout.write(f"  actual scope:   {describe_scope(policy.actual)}")
+
+        if drift:
+            raise CommandError(f"{len(drift)} policies out of sync")
+        self.stdout.write(self.style.SUCCESS("Policies in sync"))
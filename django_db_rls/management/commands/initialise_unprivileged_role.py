@@ -1,5 +1,11 @@
-from django.core.management.base import BaseCommand
-from django.db import DEFAULT_DB_ALIAS, connections
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from django_db_rls.checks import list_schemas
+from django_db_rls.context import get_params
 
 # for a non-migrating user, need:
 #  - SELECT, INSERT, UPDATE, DELETE for tables
@@ -17,32 +23,159 @@ BEGIN
 END
 $$
 ;
+"""
 
-GRANT USAGE ON SCHEMA public TO "{role}";
+# Each grant is only run if the role is missing any of its privileges so that the command is idempotent & cheap to
+# rerun across many schemas
+
+database_privileges = """\
+SELECT
+    NOT has_database_privilege(%(role)s, current_database(), 'CREATE'),
+    array(
+        SELECT param FROM unnest(%(params)s::text[]) AS param
+        WHERE NOT has_parameter_privilege(%(role)s, param, 'SET')
+    )
+"""
 
--- Necessary when unprivileged role will be used for migrations
-GRANT CREATE ON SCHEMA public TO "{role}";
+database_grants = """\
 -- Necessary for CREATE EXTENSION
 GRANT CREATE ON DATABASE "{database}" TO "{role}";
+"""
 
-GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA public TO "{role}";
-ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT SELECT, INSERT, UPDATE, DELETE ON TABLES TO "{role}";
-
-GRANT SELECT, USAGE ON ALL SEQUENCES IN SCHEMA public TO "{role}";
-ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT USAGE, SELECT ON SEQUENCES TO "{role}";
+schema_privileges = """\
+WITH
+    r AS (SELECT oid FROM pg_roles WHERE rolname = %(role)s),
+    n AS (SELECT oid FROM pg_namespace WHERE nspname = %(schema)s),
+    defaults AS (
+        SELECT d.defaclobjtype AS type, array_agg(a.privilege_type::text) AS privileges
+        FROM pg_default_acl d CROSS JOIN LATERAL aclexplode(d.defaclacl) a
+        WHERE d.defaclrole = (SELECT oid FROM pg_roles WHERE rolname = current_user)
+        AND d.defaclnamespace = (SELECT oid FROM n)
+        AND a.grantee = (SELECT oid FROM r)
+        GROUP BY d.defaclobjtype
+    )
+SELECT
+    NOT has_schema_privilege((SELECT oid FROM r), (SELECT oid FROM n), 'USAGE'),
+    NOT has_schema_privilege((SELECT oid FROM r), (SELECT oid FROM n), 'CREATE'),
+    EXISTS (
+        SELECT FROM pg_class c
+        WHERE c.relnamespace = (SELECT oid FROM n) AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        AND NOT (
+            has_table_privilege((SELECT oid FROM r), c.oid, 'SELECT')
+            AND has_table_privilege((SELECT oid FROM r), c.oid, 'INSERT')
+            AND has_table_privilege((SELECT oid FROM r), c.oid, 'UPDATE')
+            AND has_table_privilege((SELECT oid FROM r), c.oid, 'DELETE')
+        )
+    ),
+    NOT coalesce(
+        (SELECT privileges FROM defaults WHERE type = 'r') @> array['SELECT', 'INSERT', 'UPDATE', 'DELETE'], false
+    ),
+    EXISTS (
+        SELECT FROM pg_class c
+        WHERE c.relnamespace = (SELECT oid FROM n) AND c.relkind = 'S'
+        AND NOT (
+            has_sequence_privilege((SELECT oid FROM r), c.oid, 'SELECT')
+            AND has_sequence_privilege((SELECT oid FROM r), c.oid, 'USAGE')
+        )
+    ),
+    NOT coalesce((SELECT privileges FROM defaults WHERE type = 'S') @> array['SELECT', 'USAGE'], false),
+    EXISTS (
+        SELECT FROM pg_proc p
+        WHERE p.pronamespace = (SELECT oid FROM n) AND NOT has_function_privilege((SELECT oid FROM r), p.oid, 'EXECUTE')
+    ),
+    NOT coalesce((SELECT privileges FROM defaults WHERE type = 'f') @> array['EXECUTE'], false)
+"""
 
-GRANT EXECUTE ON ALL FUNCTIONS IN SCHEMA public TO "{role}";
-ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT EXECUTE ON FUNCTIONS TO "{role}";
+# in the same order as the columns of schema_privileges
+schema_grants = [
+    'GRANT USAGE ON SCHEMA {schema} TO "{role}"',
+    # Necessary when unprivileged role will be used for migrations
+    'GRANT CREATE ON SCHEMA {schema} TO "{role}"',
+    'GRANT SELECT, INSERT, UPDATE, DELETE ON ALL TABLES IN SCHEMA {schema} TO "{role}"',
+    'ALTER DEFAULT PRIVILEGES IN SCHEMA {schema} GRANT SELECT, INSERT, UPDATE, DELETE ON TABLES TO "{role}"',
+    'GRANT SELECT, USAGE ON ALL SEQUENCES IN SCHEMA {schema} TO "{role}"',
+    'ALTER DEFAULT PRIVILEGES IN SCHEMA {schema} GRANT USAGE, SELECT ON SEQUENCES TO "{role}"',
+    'GRANT EXECUTE ON ALL FUNCTIONS IN SCHEMA {schema} TO "{role}"',
+    'ALTER DEFAULT PRIVILEGES IN SCHEMA {schema} GRANT EXECUTE ON FUNCTIONS TO "{role}"',
+]
 
-GRANT SET ON PARAMETER "app.user" TO "{role}";
+drop_owned = """\
+DO
+$$
+BEGIN
+  IF EXISTS (SELECT * FROM pg_roles WHERE rolname = '{role}') THEN
+     DROP OWNED BY "{role}";
+  END IF;
+END
+$$
+;
 """
 
 drop_rls_role = """\
-DROP OWNED BY "{role}";
-DROP ROLE "{role}";
+DROP ROLE IF EXISTS "{role}";
 """
 
 
+def provision_database(alias, role):
+    """
+    Create the role if it doesn't exist & grant its database privileges, returning the number of grants run & skipped.
+    """
+    database_name = connections[alias].settings_dict["NAME"]
+    params = get_params()
+    with connections[alias].cursor() as cursor:
+        cursor.execute(create_rls_role.format(role=role))
+        cursor.execute(database_privileges, {"role": role, "params": params})
+        missing_create, missing_params = cursor.fetchone()
+        if missing_create:
+            cursor.execute(database_grants.format(role=role, database=database_name))
+        if missing_params:
+            parameters = ", ".join(f'"{param}"' for param in missing_params)
+            cursor.execute(f'GRANT SET ON PARAMETER {parameters} TO "{role}"')
+    granted = missing_create + len(missing_params)
+    return granted, 1 + len(params) - granted
+
+
+def provision_schema(alias, role, schema):
+    """
+    Grant the role's privileges in the schema, returning the number of grants run & skipped.
+    """
+    quoted_schema = connections[alias].ops.quote_name(schema)
+    with connections[alias].cursor() as cursor:
+        cursor.execute(schema_privileges, {"role": role, "schema": schema})
+        missing = cursor.fetchone()
+        for grant, needed in zip(schema_grants, missing, strict=True):
+            if needed:
+                cursor.execute(grant.format(role=role, schema=quoted_schema))
+    granted = sum(missing)
+    return granted, len(schema_grants) - granted
+
+
+def remove_owned(alias, role):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(drop_owned.format(role=role))
+    return 1, 0
+
+
+def remove_role(alias, role):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(drop_rls_role.format(role=role))
+    return 1, 0
+
+
+def run_target(func, alias, *args):
+    """
+    Run func in its own transaction on a connection of the worker thread's own, returning its result & the time
+    taken.
+    """
+    start = time.perf_counter()
+    try:
+        with transaction.atomic(using=alias):
+            result = func(alias, *args)
+    finally:
+        connections[alias].close()
+    return result, time.perf_counter() - start
+
+
 class Command(BaseCommand):
     help = "Setup an unprivileged role"
 
@@ -51,21 +184,96 @@ class Command(BaseCommand):
         parser.add_argument("-r", "--remove", action="store_true")
         parser.add_argument(
             "--database",
-            default=DEFAULT_DB_ALIAS,
+            action="append",
+            dest="databases",
             choices=tuple(connections),
-            help=('Nominates a database. Defaults to the "default" database.'),
+            help=(
+                'Nominates a database, may be repeated. Defaults to the "default" database.'
+            ),
+        )
+        parser.add_argument(
+            "--schema",
+            action="append",
+            dest="schemas",
+            help='Nominates a schema, may be repeated. Defaults to "public".',
+        )
+        parser.add_argument(
+            "--all-schemas",
+            action="store_true",
+            help="Grant in every schema other than the system schemas, eg for schema-per-tenant.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of databases & schemas to provision concurrently.",
         )
 
     def handle(self, *args, **options):
-        db_alias = options["database"]
-        database_name = connections[db_alias].settings_dict["NAME"]
-        with connections[db_alias].cursor() as cursor:
-            role_name = options["role_name"]
-            sql = (drop_rls_role if options["remove"] else create_rls_role).format(
-                role=role_name,
-                database=database_name,
+        role_name = options["role_name"]
+        aliases = options["databases"] or [DEFAULT_DB_ALIAS]
+        start = time.perf_counter()
+        self.failed = 0
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as self.executor:
+            if options["remove"]:
+                # objects are owned per database, the role is dropped once per cluster after all of them
+                self.run_targets(
+                    [(remove_owned, alias, role_name) for alias in aliases]
+                )
+                if not self.failed:
+                    for alias in aliases:
+                        self.run_targets([(remove_role, alias, role_name)])
+            else:
+                # roles are shared across databases on the same cluster so are created one database at a time
+                for alias in aliases:
+                    self.run_targets([(provision_database, alias, role_name)])
+                if options["all_schemas"]:
+                    schemas = {
+                        alias: self.executor.submit(list_schemas, alias)
+                        for alias in aliases
+                    }
+                    targets = [
+                        (alias, schema)
+                        for alias, future in schemas.items()
+                        for schema in future.result()
+                    ]
+                else:
+                    targets = [
+                        (alias, schema)
+                        for alias in aliases
+                        for schema in options["schemas"] or ["public"]
+                    ]
+                self.run_targets(
+                    [
+                        (provision_schema, alias, role_name, schema)
+                        for alias, schema in targets
+                    ]
+                )
+
+        elapsed = time.perf_counter() - start
+        if self.failed:
+            raise CommandError(f"{self.failed} targets failed in {elapsed:.2f}s")
+        verb = "removed" if options["remove"] else "created"
+        message = f'Role "{role_name}" {verb} in {elapsed:.2f}s'
+        self.stdout.write(self.style.SUCCESS(message))
+
+    def run_targets(self, targets):
+        """
+        Run the targets concurrently, each in its own transaction, reporting each one's grants & time as it completes.
+        """
+        futures = {
+            self.executor.submit(run_target, *target): target for target in targets
+        }
+        for future in as_completed(futures):
+            func, alias, *args = futures[future]
+            name = "/".join([alias, *args[1:]])
+            try:
+                (granted, skipped), elapsed = future.result()
+            except Exception as e:
+                self.failed += 1
+                self.stderr.write(f"{name}: {func.__name__} failed: {e}")
+                continue
+            self.stdout.write(
+                f"{name}: {func.__name__} ran {granted}, skipped {skipped} in {elapsed * 1000:.1f} ms"
             )
-            cursor.execute(sql)
-            verb = "removed" if options["remove"] else "created"
-            message = f'Role "{role_name}" {verb}'
-            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,255 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from django_db_rls.checks import (
+    diff_policies,
+    expected_policy,
+    fetch_rls_catalog,
+    get_rls_databases,
+    list_schemas,
+)
+
+COLUMNS = ("database", "schema", "table", "model", "rls", "force", "policies", "status")
+
+
+def table_status(model, catalog_entry, drift):
+    """
+    Return the issues for the model's table given its catalog entry (or None if it doesn't exist) and policy drift.
+    """
+    db_rls = getattr(model._meta, "db_rls", False)
+    db_rls_force = getattr(model._meta, "db_rls_force", None)
+    if catalog_entry is None:
+        return []
+    enabled, forced, active, _ = catalog_entry
+    issues = []
+    if db_rls and not enabled:
+        issues.append("rls not enabled")
+    elif db_rls and not active:
+        issues.append("rls not active for the current role")
+    elif not db_rls and enabled:
+        issues.append("rls enabled but db_rls is not set")
+    if db_rls_force and not forced:
+        issues.append("rls not forced")
+    elif db_rls_force is False and forced:
+        # enable_rls() forces unless db_rls_force = False
+        issues.append("rls forced but db_rls_force = False")
+    issues += [f"policy {policy.name} {policy.kind}" for policy in drift]
+    return issues
+
+
+class Command(BaseCommand):
+    help = (
+        "Report RLS status & policies of models across databases & schemas, exiting with an error if out of sync with "
+        "the models"
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "app_label",
+            nargs="*",
+            help="Restrict to the given app labels.",
+        )
+        parser.add_argument(
+            "--database",
+            action="append",
+            dest="databases",
+            choices=tuple(connections),
+            help=(
+                "Nominates a database, may be repeated. Defaults to the databases RLS applies to, see "
+                "DB_RLS_DATABASES."
+            ),
+        )
+        parser.add_argument(
+            "--schema",
+            action="append",
+            dest="schemas",
+            help="Nominates a schema, may be repeated. Defaults to the search path.",
+        )
+        parser.add_argument(
+            "--all-schemas",
+            action="store_true",
+            help="Report every schema other than the system schemas, eg for schema-per-tenant.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Also report models without RLS that are in sync.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["table", "json"],
+            default="table",
+            help="Output as a table or as JSON lines.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of databases & schemas to query concurrently.",
+        )
+
+    def handle(self, *args, **options):
+        if options["app_label"]:
+            models = [
+                model
+                for app_label in options["app_label"]
+                for model in apps.get_app_config(app_label).get_models()
+            ]
+        else:
+            models = apps.get_models()
+        models = {model._meta.db_table: model for model in models}
+
+        # compile once, rather than in each thread
+        expected = {}
+        for table_name, model in models.items():
+            expected[table_name] = {}
+            for policy in getattr(model._meta, "db_rls_policies", []):
+                policy.compile(model)
+                expected[table_name][policy.name] = expected_policy(policy)
+
+        aliases = options["databases"] or get_rls_databases()
+        self.format = options["format"]
+        self.show_all = options["all"]
+
+        drifted = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            if options["all_schemas"]:
+                schemas = {
+                    alias: executor.submit(list_schemas, alias) for alias in aliases
+                }
+                targets = [
+                    (alias, schema)
+                    for alias, future in schemas.items()
+                    for schema in future.result()
+                ]
+            else:
+                targets = [
+                    (alias, schema)
+                    for alias in aliases
+                    for schema in options["schemas"] or [None]
+                ]
+            futures = {
+                executor.submit(self.scan, alias, schema, models, expected): (
+                    alias,
+                    schema,
+                )
+                for alias, schema in targets
+            }
+
+            self.widths = {
+                "database": max(len(value) for value in ["database", *aliases]),
+                "schema": max(
+                    len(value)
+                    for value in ["schema", *(schema or "" for _, schema in targets)]
+                ),
+                "table": max(len(value) for value in ["table", *models]),
+                "model": max(
+                    len(value)
+                    for value in [
+                        "model",
+                        *(model._meta.label for model in models.values()),
+                    ]
+                ),
+                "rls": 3,
+                "force": 5,
+                "policies": 20,
+            }
+            if self.format == "table":
+                self.write_row({column: column.upper() for column in COLUMNS})
+
+            # stream each database & schema as soon as it's scanned
+            for future in as_completed(futures):
+                alias, schema = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    rows = [
+                        {
+                            "database": alias,
+                            "schema": schema,
+                            "status": f"error: {e}",
+                            "issues": [str(e)],
+                        }
+                    ]
+                for row in rows:
+                    drifted += bool(row["issues"])
+                    self.write_row(row)
+
+        if drifted:
+            raise CommandError(f"{drifted} tables out of sync")
+        if self.format == "table":
+            self.stdout.write(self.style.SUCCESS("RLS in sync"))
+
+    def scan(self, alias, schema, models, expected):
+        """
+        Return the report rows for the database & schema, fetched with a single catalog query on a connection of the
+        worker thread's own.
+        """
+        try:
+            with connections[alias].cursor() as cursor:
+                catalog = fetch_rls_catalog(cursor, models, schema)
+        finally:
+            connections[alias].close()
+
+        actual = {table_name: entry[3] for table_name, entry in catalog.items()}
+        drift = {}
+        for policy in diff_policies(models, expected, actual):
+            drift.setdefault(policy.model._meta.db_table, []).append(policy)
+
+        rows = []
+        for table_name, model in models.items():
+            entry = catalog.get(table_name)
+            issues = table_status(model, entry, drift.get(table_name, []))
+            managed = getattr(model._meta, "db_rls", False) or bool(
+                expected[table_name]
+            )
+            if not (managed or issues or self.show_all):
+                continue
+            rows.append(
+                {
+                    "database": alias,
+                    "schema": schema,
+                    "table": table_name,
+                    "model": model._meta.label,
+                    "managed": managed,
+                    "rls": None if entry is None else entry[0],
+                    "force": None if entry is None else entry[1],
+                    "active": None if entry is None else entry[2],
+                    "policies": [] if entry is None else sorted(entry[3]),
+                    "status": (
+                        "not migrated"
+                        if entry is None
+                        else "; ".join(issues) if issues else "ok"
+                    ),
+                    "issues": issues,
+                }
+            )
+        # RLS managed models first
+        rows.sort(key=lambda row: not row["managed"])
+        return rows
+
+    def write_row(self, row):
+        if self.format == "json":
+            self.stdout.write(json.dumps(row))
+            return
+
+        def display(column):
+            value = row.get(column)
+            if column in ("rls", "force") and isinstance(value, bool):
+                value = "on" if value else "off"
+            elif column == "policies" and isinstance(value, list):
+                value = ",".join(value)
+            return "-" if value is None else str(value)
+
+        line = "  ".join(
+            display(column).ljust(self.widths[column]) for column in COLUMNS[:-1]
+        )
+        line += "  " + display("status")
+        if row.get("issues"):
+            line = self.style.ERROR(line)
+        self.stdout.write(line)
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import cache
+from operator import itemgetter
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+@cache
+def load_backend(backend):
+    return (import_string(backend) if isinstance(backend, str) else backend)()
+
+
+def get_backend():
+    """
+    Return the DB_RLS_METRICS backend, or None if not configured, eg:
+
+        DB_RLS_METRICS = "django_db_rls.metrics.InMemoryCollector"
+
+    where the backend is a class (or dotted path to one) instantiated once, with timing(name, seconds, tags) &
+    incr(name, value, tags) methods to forward measurements to statsd, Prometheus, etc. Metrics recorded are:
+
+     - django_db_rls.set_config: context-setting statements run by set_config(), tagged using
+     - django_db_rls.set_config.lazy: context piggybacked onto the next query, see prefix_config
+     - django_db_rls.switch_configs: context-switching statements run by rls_context()
+     - django_db_rls.transaction: the middleware's atomic block, tagged view, using & read_only
+     - django_db_rls.render: template responses rendered inside the atomic block, tagged view & template
+     - django_db_rls.cache.hit & django_db_rls.cache.miss: the result cache, tagged model
+     - django_db_rls.ddl: RLS DDL run by migrations, tagged model & policy
+     - django_db_rls.ddl.lock_retry: RLS DDL retried after failing to acquire a lock, tagged model & policy
+    """
+    backend = getattr(settings, "DB_RLS_METRICS", None)
+    return None if backend is None else load_backend(backend)
+
+
+def clean(tags):
+    return {tag: value for tag, value in tags.items() if value is not None}
+
+
+def record(name, seconds, **tags):
+    backend = get_backend()
+    if backend is not None:
+        backend.timing(name, seconds, clean(tags))
+
+
+def incr(name, value=1, **tags):
+    backend = get_backend()
+    if backend is not None:
+        backend.incr(name, value, clean(tags))
+
+
+@contextmanager
+def timed(name, **tags):
+    """
+    Time the block, yielding the tags so that those only known by the end of the block can be added, eg the view.
+    Also usable as a hook to profile application code alongside the library's metrics.
+    """
+    backend = get_backend()
+    if backend is None:
+        yield tags
+        return
+    start = time.perf_counter()
+    try:
+        yield tags
+    finally:
+        backend.timing(name, time.perf_counter() - start, clean(tags))
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return None if match is None else match.view_name
+
+
+class InMemoryCollector:
+    """
+    Backend collecting metrics in memory, for tests or to inspect in a shell:
+
+        collector = get_backend()
+        collector.clear()
+        client.get("/notes/")
+        assert collector.count("django_db_rls.set_config") == 1
+        collector.summary()
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.timings = []
+            self.counters = Counter()
+
+    def timing(self, name, seconds, tags):
+        with self.lock:
+            self.timings.append((name, seconds, tags))
+
+    def incr(self, name, value, tags):
+        with self.lock:
+            self.counters[(name, tuple(sorted(tags.items())))] += value
+
+    def get_timings(self, name, **tags):
+        """
+        Return the timings for name with the given tags (among others).
+        """
+        return [
+            seconds
+            for timing, seconds, timing_tags in self.timings
+            if timing == name and tags.items() <= timing_tags.items()
+        ]
+
+    def count(self, name, **tags):
+        """
+        Return the number of timings, or the sum of a counter, for name with the given tags (among others).
+        """
+        return len(self.get_timings(name, **tags)) + sum(
+            value
+            for (counter, counter_tags), value in self.counters.items()
+            if counter == name and tags.items() <= dict(counter_tags).items()
+        )
+
+    def summary(self, tag=None):
+        """
+        Return count, total & max seconds for each timing, grouped by name & the value of tag if given, longest total
+        first, eg summary("view") for the views holding transactions longest.
+        """
+        groups = {}
+        for name, seconds, tags in self.timings:
+            key = (name, tags.get(tag)) if tag else (name,)
+            count, total, longest = groups.get(key, (0, 0.0, 0.0))
+            groups[key] = (count + 1, total + seconds, max(longest, seconds))
+        summary = [
+            {
+                "name": key[0],
+                **({tag: key[1]} if tag else {}),
+                "count": count,
+                "total": total,
+                "max": longest,
+            }
+            for key, (count, total, longest) in groups.items()
+        ]
+        return sorted(summary, key=itemgetter("total"), reverse=True)
@@ -1,17 +1,209 @@
-from django.db import transaction
-from django_db_rls.db_utils import set_config
+import sys
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager, nullcontext
+from functools import partial
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    close_old_connections,
+    connection,
+    connections,
+    transaction,
+)
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
 
+from django_db_rls.context import user_context
+from django_db_rls.db_utils import get_config_cache, prefix_config, set_configs
+from django_db_rls.metrics import record, timed, view_name
+from django_db_rls.routers import get_read_alias, route_to
+
+
+def use_prefix_config():
+    return getattr(settings, "DB_RLS_PREFIX_CONFIG", False)
+
+
+def prefix_config_wrapper(conn=connection):
+    if prefix_config in conn.execute_wrappers:
+        # installed for the connection with DB_RLS_POOL_SAFE
+        return nullcontext()
+    return conn.execute_wrapper(prefix_config)
+
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+
+def read_only_request(view):
+    """
+    Mark a view as read-only so that it's routed to DB_RLS_READ_ALIAS regardless of the request method.
+    """
+    view.rls_read_only = True
+    return view
+
+
+def read_write_request(view):
+    """
+    Mark a view as needing the default database even for safe methods, eg a GET that writes.
+    """
+    view.rls_read_only = False
+    return view
+
+
+def get_request_database(request):
+    """
+    Return the alias to use for the request and whether it's read-only: DB_RLS_READ_ALIAS for safe methods or views
+    marked read_only_request(), otherwise the default database.
+    """
+    read_alias = get_read_alias()
+    if read_alias is None:
+        return DEFAULT_DB_ALIAS, False
+
+    # middleware is called before the view is resolved
+    try:
+        view = resolve(request.path_info, getattr(request, "urlconf", None)).func
+    except Resolver404:
+        view = None
+    read_only = getattr(view, "rls_read_only", None)
+    if read_only is None:
+        read_only = request.method in SAFE_METHODS
+    return (read_alias, True) if read_only else (DEFAULT_DB_ALIAS, False)
+
+
+@contextmanager
+def request_context(user, request=None):
+    using, read_only = (
+        (DEFAULT_DB_ALIAS, False) if request is None else get_request_database(request)
+    )
+    with (
+        timed("django_db_rls.transaction", using=using, read_only=read_only) as tags,
+        transaction.atomic(using=using),
+        route_to(using if read_only else None),
+    ):
+        context = user_context(user, request)
+        try:
+            if use_prefix_config():
+                # piggyback set_config() onto the first query rather than spend a round trip on it
+                with prefix_config_wrapper(connections[using]):
+                    set_configs(context, lazy=True, using=using, read_only=read_only)
+                    yield
+            else:
+                set_configs(context, using=using, read_only=read_only)
+                yield
+        finally:
+            # resolved by the time the view has run
+            tags["view"] = view_name(request)
+
+
+def render_in_context(request, response):
+    with (
+        request_context(request.user, request),
+        timed(
+            "django_db_rls.render",
+            view=view_name(request),
+            template=template_name(response),
+        ),
+    ):
+        # force render
+        # this would mean this middleware needs to be before any other rendering middleware so it is applied last
+        response.content = response.render()
+        return response
+
+
+def template_name(response):
+    name = response.template_name
+    if isinstance(name, (list, tuple)):
+        name = name[0] if name else None
+    if name is None or isinstance(name, str):
+        return name
+    # a backend's template or an engine's
+    return getattr(getattr(name, "template", name), "name", None)
+
+
+def arequest_context(user, request=None):
+    return in_executor(request_context(user, request))
+
+
+@asynccontextmanager
+async def in_executor(context):
+    # Entering and exiting are each a single hop to the thread-sensitive executor which is the same thread used for
+    # the ORM's async methods & sync views throughout the request, so they all share the transaction.
+    await sync_to_async(context.__enter__)()
+    exc_info = (None, None, None)
+    try:
+        yield
+    except BaseException:
+        exc_info = sys.exc_info()
+        raise
+    finally:
+        await sync_to_async(context.__exit__)(*exc_info)
+
+
+def stream_in_context(response, context):
+    """
+    Iterate a streaming response's content within a new context, eg request_context(), rather than the one used for
+    the view which has ended by the time the content is iterated. The connection is released as soon as iteration
+    finishes (or the client disconnects) instead of at the end of the request, so long streams only hold a
+    transaction while they're being iterated.
+
+    For large exports use QuerySet.iterator() in the streamed generator which, being in a transaction, uses a
+    server-side cursor.
+    """
+    content = response.streaming_content
+    if response.is_async:
+
+        async def streaming_content():
+            try:
+                async with in_executor(context()):
+                    async for part in content:
+                        yield part
+            finally:
+                await sync_to_async(close_old_connections)()
+
+    else:
+
+        def streaming_content():
+            try:
+                with context():
+                    yield from content
+            finally:
+                close_old_connections()
+
+    response.streaming_content = streaming_content()
+    return response
+
+
+@sync_and_async_middleware
 def atomic_request_middleware(get_response):
 
     # Option 1: Blunt force similar to ATOMIC_REQUESTS but in middleware
-    def middleware(request):
-        if request.user.is_authenticated:
-            with transaction.atomic():
-                set_config("app.user", request.user.pk)
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            user = await request.auser()
+            if user.is_authenticated:
+                async with arequest_context(user, request):
+                    response = await get_response(request)
+                if response.streaming:
+                    stream_in_context(response, partial(request_context, user, request))
+                return response
+            else:
+                return await get_response(request)
+
+    else:
+
+        def middleware(request):
+            if request.user.is_authenticated:
+                with request_context(request.user, request):
+                    response = get_response(request)
+                if response.streaming:
+                    stream_in_context(
+                        response, partial(request_context, request.user, request)
+                    )
+                return response
+            else:
                 return get_response(request)
-        else:
-            return get_response(request)
 
     # unfortunately this gets processed after the middleware function
     def process_view(request, view_func, view_args, view_kwargs):
@@ -21,14 +213,10 @@ def atomic_request_middleware(get_response):
         return None
 
     # Option 2: Selective, let people manage their own txns but make sure that template responses are also rendered correctly.
+    # Left sync as rendering is sync anyway, Django will run it in the thread-sensitive executor under ASGI.
     def process_template_response(request, response):
         if request.user.is_authenticated:
-            with transaction.atomic():
-                set_config("app.user", request.user.pk)
-                # force render
-                # this would mean this middleware needs to be before any other rendering middleware so it is applied last
-                response.content = response.render()
-                return response
+            return render_in_context(request, response)
         else:
             return response
 
@@ -43,32 +231,170 @@ def atomic_request_middleware(get_response):
 
 # this is somehow buggy when posting to save data?
 class AtomicRequestMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         if request.user.is_authenticated:
-            with transaction.atomic():
-                set_config("app.user", request.user.pk)
-                return self.get_response(request)
+            with request_context(request.user, request):
+                response = self.get_response(request)
+            if response.streaming:
+                stream_in_context(
+                    response, partial(request_context, request.user, request)
+                )
+            return response
         else:
             return self.get_response(request)
 
+    async def __acall__(self, request):
+        user = await request.auser()
+        if user.is_authenticated:
+            async with arequest_context(user, request):
+                response = await self.get_response(request)
+            if response.streaming:
+                stream_in_context(response, partial(request_context, user, request))
+            return response
+        else:
+            return await self.get_response(request)
+
 
 class TemplateResponseMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
         return self.get_response(request)
 
+    # Left sync as rendering is sync anyway, Django will run it in the thread-sensitive executor under ASGI.
     def process_template_response(self, request, response):
         if request.user.is_authenticated:
-            with transaction.atomic():
-                set_config("app.user", request.user.pk)
-                # force render
-                # this would mean this middleware needs to be before any other rendering middleware so it is applied last
-                response.content = response.render()
-                return response
+            return render_in_context(request, response)
+        else:
+            return response
+
+
+class LazyRequestContext:
+    """
+    Execute wrapper that defers opening the atomic block and setting the context until the first query is run.
+    """
+
+    def __init__(self, request, user=None):
+        self.request = request
+        # given when already fetched, eg by request.auser()
+        self.user = user
+        self.atomic = None
+        self.applying = False
+
+    def __enter__(self):
+        self.using, self.read_only = get_request_database(self.request)
+        conn = connections[self.using]
+        # Must be run before prefix_config, which may already be installed for the connection with DB_RLS_POOL_SAFE,
+        # so that the context is applied to the same statement
+        conn.execute_wrappers.insert(0, self)
+        self.wrappers = ExitStack()
+        self.wrappers.callback(conn.execute_wrappers.remove, self)
+        if self.read_only:
+            self.wrappers.enter_context(route_to(self.using))
+        if use_prefix_config():
+            self.wrappers.enter_context(prefix_config_wrapper(conn))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wrappers.close()
+        if self.atomic is not None:
+            try:
+                self.atomic.__exit__(exc_type, exc_value, traceback)
+            finally:
+                record(
+                    "django_db_rls.transaction",
+                    time.perf_counter() - self.started,
+                    view=view_name(self.request),
+                    using=self.using,
+                    read_only=self.read_only,
+                )
+
+    def __call__(self, execute, sql, params, many, context):
+        self.ensure_applied()
+        return execute(sql, params, many, context)
+
+    def ensure_applied(self):
+        # guard against recursion from the queries run here
+        if not self.applying and "app.user" not in get_config_cache(self.using):
+            self.applying = True
+            try:
+                self.apply()
+            finally:
+                self.applying = False
+
+    def apply(self):
+        if self.atomic is None and not connections[self.using].in_atomic_block:
+            self.atomic = transaction.atomic(using=self.using)
+            self.atomic.__enter__()
+            self.started = time.perf_counter()
+        set_configs(
+            user_context(self.user or self.request.user, self.request),
+            lazy=use_prefix_config(),
+            using=self.using,
+            read_only=self.read_only,
+        )
+
+
+def apply_lazy_context(using=DEFAULT_DB_ALIAS):
+    """
+    Apply the context of a LazyRequestContext on the connection now rather than on the first query, eg so that it's
+    known before running one.
+    """
+    for wrapper in connections[using].execute_wrappers:
+        if isinstance(wrapper, LazyRequestContext):
+            wrapper.ensure_applied()
+
+
+class LazyAtomicRequestMiddleware:
+    """
+    Like AtomicRequestMiddleware but the atomic block is only opened once the first query is run so that requests not
+    touching the database don't hold a connection.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.user.is_authenticated:
+            with LazyRequestContext(request):
+                response = self.get_response(request)
+            if response.streaming:
+                stream_in_context(response, partial(LazyRequestContext, request))
+            return response
         else:
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        user = await request.auser()
+        if user.is_authenticated:
+            # exited in the executor as the atomic block, if opened, is in its thread
+            async with in_executor(LazyRequestContext(request, user)):
+                response = await self.get_response(request)
+            if response.streaming:
+                stream_in_context(response, partial(LazyRequestContext, request, user))
             return response
+        else:
+            return await self.get_response(request)
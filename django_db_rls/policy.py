@@ -1,69 +1,249 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import connection
-from django.db.models import Exists
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.db.models import Exists, Func
 from django.db.models.sql.query import Query
+from django.db.models.sql.where import WhereNode
+
+from django_db_rls.db_utils import AppIsSuperuser, AppUser, policy_options
+
+if is_psycopg3:
+    from psycopg.sql import quote
+else:
+    from psycopg2.extensions import adapt
+
+    def quote(value):
+        adapted = adapt(value)
+        # strings can't be prepared without a connection so must be told the encoding
+        if hasattr(adapted, "encoding"):
+            adapted.encoding = "utf-8"
+        return adapted.getquoted().decode()
 
-from django_db_rls.db_utils import AppUser
 
 User = get_user_model()
 
+compiled_expressions = {}
+
+
+class InitPlan(Func):
+    """
+    Wrap a row-independent expression in a scalar subquery so that Postgres evaluates it once per query as an InitPlan
+    rather than once per row, with the result usable as an index condition.
+    """
+
+    template = "(SELECT %(expressions)s)"
+
+
+def is_row_independent(expression):
+    if getattr(expression, "contextual", False):
+        return True
+    # uncorrelated subqueries
+    return isinstance(expression, Exists) and not expression.query.get_external_cols()
+
+
+def optimize(node):
+    """
+    Return a copy of the compiled where node with row-independent expressions wrapped in InitPlan.
+
+    Leaf lookups may be shared with the original expression so the tree is copied as it's rewritten, never mutated.
+    """
+    if isinstance(node, WhereNode):
+        clone = node.clone()
+        clone.children = [optimize(child) for child in node.children]
+        return clone
+    if is_row_independent(node):
+        return InitPlan(node, output_field=node.output_field)
+    if isinstance(node, Exists):
+        # correlated, optimize within
+        clone = node.copy()
+        clone.query = node.query.clone()
+        clone.query.where = optimize(node.query.where)
+        return clone
+    if hasattr(node, "get_source_expressions"):
+        sources = node.get_source_expressions()
+        optimized = [optimize(source) for source in sources]
+        if any(new is not old for new, old in zip(optimized, sources)):
+            node = node.copy()
+            node.set_source_expressions(optimized)
+    return node
+
+
+def function_fingerprint(function):
+    """
+    Return everything a function's result may depend on: its code, closure, defaults & the globals it refers to.
+    """
+    names = set()
+    codes = [function.__code__]
+    while codes:
+        code = codes.pop()
+        names.update(code.co_names)
+        # nested functions & comprehensions
+        codes += [const for const in code.co_consts if hasattr(const, "co_names")]
+    return (
+        function.__code__,
+        tuple(cell.cell_contents for cell in function.__closure__ or ()),
+        function.__defaults__,
+        tuple(sorted((function.__kwdefaults__ or {}).items())),
+        tuple(
+            (name, function.__globals__[name])
+            for name in sorted(names)
+            if name in function.__globals__
+        ),
+    )
+
+
+def fingerprint(expression, model):
+    if hasattr(expression, "__code__"):
+        # functions & lambdas, eg IsSuperuserPolicy, return a new expression each call
+        expression = function_fingerprint(expression)
+    columns = tuple(field.column for field in model._meta.concrete_fields)
+    optimized = getattr(settings, "DB_RLS_OPTIMIZE_POLICIES", False)
+    return (
+        expression,
+        model._meta.label_lower,
+        model._meta.db_table,
+        columns,
+        optimized,
+    )
+
+
+def evaluate(expression):
+    # functions & lambdas may return an expression or SQL
+    return expression() if callable(expression) else expression
+
+
+def build_where(expression, model):
+    query = Query(model=model)  # must alias_cols!
+    return query, query.build_where(evaluate(expression))
+
+
+def compile_expression(expression, model):
+    """
+    Compile an expression to SQL with params inlined as literals, without requiring a database connection.
+    """
+    try:
+        key = fingerprint(expression, model)
+        return compiled_expressions[key]
+    except TypeError:
+        # unhashable, don't memoize
+        key = None
+    except KeyError:
+        pass
+
+    value = evaluate(expression)
+    if isinstance(value, str):
+        return value
+    query, where = build_where(value, model)
+    if getattr(settings, "DB_RLS_OPTIMIZE_POLICIES", False):
+        where = optimize(where)
+    compiler = query.get_compiler(connection=connection)
+    sql, params = where.as_sql(compiler, connection)
+    sql = sql % tuple(quote(param) for param in params)
+
+    if key is not None:
+        compiled_expressions[key] = sql
+    return sql
+
+
+COMMANDS = ("ALL", "SELECT", "INSERT", "UPDATE", "DELETE")
+
 
 class Policy:
-    def __init__(self, *, using, check=None, name=None):
+    """
+    A row security policy, permissive & applying to all commands & roles unless given:
+
+     - for_: the command the policy applies to, one of ALL, SELECT, INSERT, UPDATE or DELETE, so that eg an expensive
+       write check isn't evaluated by reads
+     - as_restrictive: combine with AND rather than OR, requiring at least one permissive policy to grant access
+     - to: role names the policy applies to, defaults to PUBLIC
+
+    Postgres doesn't allow using for INSERT nor check for SELECT & DELETE.
+    """
+
+    def __init__(
+        self,
+        *,
+        using=None,
+        check=None,
+        name=None,
+        for_="ALL",
+        as_restrictive=False,
+        to=None,
+    ):
+        for_ = for_.upper()
+        if for_ not in COMMANDS:
+            raise ValueError(f"for_ must be one of {', '.join(COMMANDS)}, not {for_}")
+        if using is None and check is None:
+            raise ValueError("Policy requires using, check or both")
+        if for_ == "INSERT" and using is not None:
+            raise ValueError("INSERT policies only accept check")
+        if for_ in ("SELECT", "DELETE") and check is not None:
+            raise ValueError(f"{for_} policies only accept using")
         self.using = using
         self.check = check
         self.name = name
+        self.for_ = for_
+        self.as_restrictive = as_restrictive
+        self.to = None if to is None else tuple([to] if isinstance(to, str) else to)
+        # kept after compiling for analysis, eg index advice
+        self.using_expression = using
+
+    @property
+    def options(self):
+        return policy_options(self.for_, self.as_restrictive, self.to)
 
     def compile(self, model):
         if self.name is None:
             self.name = f"{model._meta.model_name}_policy"
 
-        if callable(self.using):
-            self.using = self.using()
-        if isinstance(self.using, str):
-            pass
-        else:
-            query = Query(model=model)  # must alias_cols!
-            where = query.build_where(self.using)
-            compiler = query.get_compiler(connection=connection)
-            using, params = where.as_sql(compiler, connection)
-            with connection.cursor() as cur:
-                self.using = cur.mogrify(using, params)
-                # pscyopg2
-                if isinstance(self.using, bytes):
-                    self.using = self.using.decode("utf-8")
-
-        if self.check:
-            if callable(self.check):
-                self.check = self.check()
-            if isinstance(self.check, str):
-                pass
-            else:
-                query = Query(model=model)  # must alias_cols!
-                where = query.build_where(self.check)
-                compiler = query.get_compiler(connection=connection)
-                check, params = where.as_sql(compiler, connection)
-                with connection.cursor() as cur:
-                    self.check = cur.mogrify(check, params)
-                    # pscyopg2
-                    if isinstance(self.using, bytes):
-                        self.using = self.using.decode("utf-8")
+        if self.using is not None and not isinstance(self.using, str):
+            self.using = compile_expression(self.using, model)
+
+        if self.check and not isinstance(self.check, str):
+            self.check = compile_expression(self.check, model)
 
     def __eq__(self, other):
+        if not isinstance(other, Policy):
+            return NotImplemented
         return (
             self.name == other.name
             and self.using == other.using
             and self.check == other.check
+            and self.for_ == other.for_
+            and self.as_restrictive == other.as_restrictive
+            and self.to == other.to
+        )
+
+    def __hash__(self):
+        return hash(
+            (
+                self.name,
+                self.using,
+                self.check,
+                self.for_,
+                self.as_restrictive,
+                self.to,
+            )
         )
 
 
 class IsSuperuserPolicy(Policy):
     """
     Allow Django is_superuser users (not to be confused with postgres SUPERUSER)
+
+    With claims=True the app.is_superuser claim is checked instead of querying the user table, which requires
+    "is_superuser" in DB_RLS_CLAIMS.
     """
 
-    def __init__(self, name="is_superuser"):
+    def __init__(self, name="is_superuser", claims=False):
         super().__init__(
-            using=lambda: Exists(User.objects.filter(pk=AppUser(), is_superuser=True)),
+            using=(
+                AppIsSuperuser()
+                if claims
+                else lambda: Exists(
+                    User.objects.filter(pk=AppUser(), is_superuser=True)
+                )
+            ),
             name=name,
         )
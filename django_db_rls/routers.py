@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+
+state = Local()
+
+
+def get_read_alias():
+    return getattr(settings, "DB_RLS_READ_ALIAS", None)
+
+
+@contextmanager
+def route_to(alias):
+    """
+    Route all queries to alias for the duration, or don't route if alias is None.
+    """
+    previous = getattr(state, "alias", None)
+    state.alias = alias
+    try:
+        yield
+    finally:
+        state.alias = previous
+
+
+class ReadOnlyRouter:
+    """
+    Route queries to the DB_RLS_READ_ALIAS database for read-only requests, where the middleware has applied the RLS
+    context on that alias in a read-only transaction.
+
+        DATABASE_ROUTERS = ["django_db_rls.routers.ReadOnlyRouter"]
+    """
+
+    def db_for_read(self, model, **hints):
+        return getattr(state, "alias", None)
+
+    def db_for_write(self, model, **hints):
+        # fail in the read-only transaction rather than write outside of the context on another alias
+        return getattr(state, "alias", None)
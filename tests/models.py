@@ -0,0 +1,6 @@
+from django.db import models
+
+
+class Item(models.Model):
+    owner = models.IntegerField(db_index=True)
+    title = models.CharField(max_length=100)
@@ -0,0 +1,20 @@
+import os
+
+SECRET_KEY = "django-db-rls-tests"
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django_db_rls",
+    "tests",
+]
+# configured with the libpq PG* environment variables, must be able to CREATE DATABASE & CREATE ROLE
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("PGDATABASE", "django_db_rls"),
+    },
+}
+USE_TZ = True
+DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
+# tests that need RLS to apply SET ROLE to an unprivileged role
+SILENCED_SYSTEM_CHECKS = ["django_db_rls.E001"]
@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import RequestFactory, TransactionTestCase
+
+from django_db_rls.cache import CachedQuerySet, cache_key, result_cache
+from django_db_rls.db_utils import get_config_cache, set_configs
+from django_db_rls.middleware import LazyRequestContext
+
+from .models import Item
+
+
+class CachedTests(TransactionTestCase):
+    def setUp(self):
+        result_cache.clear()
+        self.addCleanup(result_cache.clear)
+        Item.objects.create(owner=1, title="a")
+        self.queryset = CachedQuerySet(Item).cached()
+
+    def test_empty_result_set(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(list(self.queryset.none()), [])
+            self.assertEqual(list(self.queryset.filter(pk__in=[])), [])
+        self.assertEqual(result_cache.entries, {})
+
+    def test_autocommit(self):
+        list(self.queryset)
+        self.assertEqual(len(result_cache.entries), 1)
+
+    def test_read_only_transaction(self):
+        with transaction.atomic():
+            set_configs({}, read_only=True)
+            list(self.queryset)
+            self.assertEqual(len(result_cache.entries), 1)
+
+    def test_write_transaction_cached_on_commit(self):
+        with transaction.atomic():
+            list(self.queryset)
+            self.assertEqual(result_cache.entries, {})
+        self.assertEqual(len(result_cache.entries), 1)
+
+    def test_write_transaction_rolled_back(self):
+        with transaction.atomic():
+            Item.objects.update(title="b")
+            self.assertEqual(self.queryset.get().title, "b")
+            transaction.set_rollback(True)
+        self.assertEqual(result_cache.entries, {})
+        self.assertEqual(self.queryset.get().title, "a")
+
+    def test_subquery_invalidated(self):
+        queryset = self.queryset.filter(owner__in=User.objects.values("pk"))
+        self.assertEqual(list(queryset), [])
+        User.objects.create(pk=1, username="user")
+        self.assertEqual(len(queryset.all()), 1)
+
+    def test_prefetch_not_cached(self):
+        user = User.objects.create(username="user")
+        group = user.groups.create(name="a")
+        queryset = CachedQuerySet(User).cached().prefetch_related("groups")
+        list(queryset)
+        group.name = "b"
+        group.save()
+        with self.assertNumQueries(1):
+            [user] = queryset.all()
+            [group] = user.groups.all()
+        self.assertEqual(group.name, "b")
+
+    def test_invalidated_on_commit(self):
+        with transaction.atomic():
+            Item.objects.get().save()
+            # as cached by another connection before the commit
+            list(self.queryset)
+        self.assertEqual(len(result_cache.entries), 1)
+        with self.assertNumQueries(1):
+            list(self.queryset.all())
+
+    def test_lazy_request_context(self):
+        keys = set()
+        for username in ["a", "b"]:
+            request = RequestFactory().get("/")
+            request.user = User.objects.create(username=username)
+            with LazyRequestContext(request):
+                keys.add(cache_key(self.queryset))
+                self.assertEqual(
+                    get_config_cache(connection.alias)["app.user"], str(request.user.pk)
+                )
+        self.assertEqual(len(keys), 2)
@@ -0,0 +1,129 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from django_db_rls.checks import cached_fetch, normalise_expression
+from django_db_rls.db_utils import create_policy
+
+from .models import Item
+
+
+class NormaliseExpressionTests(SimpleTestCase):
+    def assertSame(self, django, postgres):
+        self.assertEqual(
+            normalise_expression(django, "app_note"),
+            normalise_expression(postgres, "app_note"),
+        )
+
+    def assertDifferent(self, a, b):
+        self.assertNotEqual(
+            normalise_expression(a, "app_note"), normalise_expression(b, "app_note")
+        )
+
+    def test_deparsed(self):
+        # as compiled by Django & deparsed by Postgres
+        self.assertSame(
+            """"app_note"."owner_id" = (nullif(current_setting('app.user', true), '')::int)""",
+            "(owner_id = (NULLIF(current_setting('app.user'::text, true), ''::text))::integer)",
+        )
+        self.assertSame(
+            """("app_note"."owner_id" = 1 OR ("app_note"."text" = 'a' AND "app_note"."id" > 5))""",
+            "((owner_id = 1) OR ((text = 'a'::text) AND (id > 5)))",
+        )
+        self.assertSame(
+            """"app_note"."owner_id" = (SELECT nullif(current_setting('app.user', true), '')::int)""",
+            """(owner_id = ( SELECT (NULLIF(current_setting('app.user'::text, true), ''::text))::integer AS "nullif"))""",
+        )
+        self.assertSame(
+            """EXISTS(SELECT 1 AS "a" FROM "auth_user" U0 WHERE (U0."is_active" AND U0."id" = ("app_note"."owner_id")) LIMIT 1)""",
+            "(EXISTS ( SELECT 1 AS a\n   FROM auth_user u0\n  WHERE (u0.is_active AND (u0.id = app_note.owner_id))\n LIMIT 1))",
+        )
+
+    def test_operators(self):
+        self.assertSame(""""app_note"."id" IN (1, 2)""", "(id = ANY (ARRAY[1, 2]))")
+        self.assertSame("id NOT IN (1, 2)", "(id <> ALL (ARRAY[1, 2]))")
+        self.assertSame(
+            """"app_note"."text"::text LIKE  E'a\\\\%b%'""", "(text ~~ 'a\\%b%'::text)"
+        )
+        self.assertSame("a != b", "(a <> b)")
+        self.assertSame("a IS NOT NULL", "(a IS NOT NULL)")
+
+    def test_between(self):
+        # as compiled by Django & deparsed by Postgres
+        self.assertSame(
+            """"app_note"."id" BETWEEN 1 AND 5""", "((id >= 1) AND (id <= 5))"
+        )
+        self.assertSame(
+            """("app_note"."id" BETWEEN 1 AND 5 OR "app_note"."text" = 'x')""",
+            "(((id >= 1) AND (id <= 5)) OR (text = 'x'::text))",
+        )
+        self.assertSame("id NOT BETWEEN -1 AND 5", "((id < '-1'::integer) OR (id > 5))")
+        self.assertDifferent("id BETWEEN 1 AND 5", "((id >= 1) AND (id < 5))")
+
+    def test_signed_literals(self):
+        # as compiled by Django & deparsed by Postgres
+        self.assertSame(""""app_note"."id" <=  -1""", "(id <= '-1'::integer)")
+        self.assertSame(
+            """"app_note"."id" BETWEEN  -5 AND  -1""",
+            "((id >= '-5'::integer) AND (id <= '-1'::integer))",
+        )
+        self.assertSame(
+            """"app_note"."id" IN ( -1, 2)""", "(id = ANY (ARRAY['-1'::integer, 2]))"
+        )
+        self.assertSame("id::numeric = -1.5", "((id)::numeric = '-1.5'::numeric)")
+        self.assertDifferent("id <= -1", "id <= 1")
+        self.assertDifferent("id = - id", "id = id")
+
+    def test_literals_untouched(self):
+        self.assertSame("text = 'it''s'", "(text = 'it''s'::text)")
+        self.assertDifferent("text = 'A'", "text = 'a'")
+        self.assertDifferent("text = '(a)'", "text = 'a'")
+
+    def test_redundant_parentheses(self):
+        self.assertSame("a AND (b AND c)", "((a AND b) AND c)")
+        self.assertSame("(a = 1)", "a = 1")
+        self.assertSame("a * b + c", "((a * b) + c)")
+
+    def test_precedence(self):
+        self.assertDifferent("a OR b AND c", "(a OR b) AND c")
+        self.assertDifferent("NOT a AND b", "NOT (a AND b)")
+        self.assertDifferent("a - (b - c)", "a - b - c")
+        self.assertDifferent("a * (b + c)", "a * b + c")
+        self.assertDifferent("a OR b AND c", "a AND b OR c")
+
+    def test_casts(self):
+        self.assertSame("x::int", "(x)::integer")
+        self.assertSame("x::int[]", "(x)::integer[]")
+        self.assertDifferent("x::int = 1", "x::text = 1")
+        self.assertDifferent("x::int = 1", "x::bigint = 1")
+
+
+@override_settings(DB_RLS_CHECKS_CACHE="default")
+class CachedFetchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.fetches = 0
+
+    def fetch(self, cursor):
+        self.fetches += 1
+
+    def cached_fetch(self):
+        cached_fetch(connection.alias, "test", [Item._meta.db_table], self.fetch)
+
+    def create_policy(self, model):
+        with connection.schema_editor() as editor:
+            create_policy(editor, "test", model, "true", None)
+
+    def test_checked_table_changed(self):
+        self.cached_fetch()
+        self.create_policy(Item)
+        self.cached_fetch()
+        self.assertEqual(self.fetches, 2)
+
+    def test_other_table_changed(self):
+        self.cached_fetch()
+        self.create_policy(User)
+        self.cached_fetch()
+        self.assertEqual(self.fetches, 1)
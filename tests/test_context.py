@@ -0,0 +1,94 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from django_db_rls.context import principals_in_context, rls_context, user_context
+from django_db_rls.db_utils import get_config_cache, set_config
+
+
+@override_settings(DB_RLS_CLAIMS=["group_ids"])
+class UserContextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="user")
+        cls.user.groups.add(
+            Group.objects.create(name="b"), Group.objects.create(name="a")
+        )
+
+    def test_group_ids(self):
+        group_ids = sorted(self.user.groups.values_list("pk", flat=True))
+        with self.assertNumQueries(1):
+            context = user_context(self.user)
+        self.assertEqual(context["app.group_ids"], "{%s,%s}" % tuple(group_ids))
+
+    def test_group_ids_prefetched(self):
+        user = User.objects.prefetch_related("groups").get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            context = user_context(user)
+        self.assertEqual(context, user_context(self.user))
+
+
+class RLSContextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="user")
+
+    def test_set_config_within(self):
+        with rls_context(user=self.user):
+            # the same value as set by the context, a no-op
+            set_config("app.user", self.user.pk)
+            self.assertEqual(get_config_cache()["app.user"], str(self.user.pk))
+        self.assertNotIn("app.user", get_config_cache())
+
+
+class PrincipalsInContextTests(TransactionTestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username=f"user{i}") for i in range(5)]
+
+    def process(self, user):
+        self.assertEqual(get_config_cache()["app.user"], str(user.pk))
+        User.objects.filter(pk=user.pk).update(first_name="processed")
+
+    def processed(self):
+        return set(
+            User.objects.filter(first_name="processed").values_list("pk", flat=True)
+        )
+
+    def test_all(self):
+        with principals_in_context(User.objects.all(), chunk_size=2) as principals:
+            for user in principals:
+                self.process(user)
+        self.assertEqual(self.processed(), {user.pk for user in self.users})
+
+    def test_break(self):
+        with principals_in_context(User.objects.all()) as principals:
+            for user in principals:
+                self.process(user)
+                if user == self.users[2]:
+                    break
+        # ended when the block is left rather than whenever the generator is garbage collected
+        self.assertFalse(connection.in_atomic_block)
+        self.assertEqual(self.processed(), {user.pk for user in self.users[:3]})
+
+    def test_exception(self):
+        with self.assertRaisesMessage(ValueError, "failed"):
+            with principals_in_context(User.objects.all()) as principals:
+                for user in principals:
+                    self.process(user)
+                    if user == self.users[2]:
+                        raise ValueError("failed")
+        # the failed user is rolled back
+        self.assertFalse(connection.in_atomic_block)
+        self.assertEqual(self.processed(), {user.pk for user in self.users[:2]})
+
+    def test_exception_without_savepoint(self):
+        with self.assertRaisesMessage(ValueError, "failed"):
+            with principals_in_context(
+                User.objects.all(), chunk_size=2, savepoint=False
+            ) as principals:
+                for user in principals:
+                    self.process(user)
+                    if user == self.users[2]:
+                        raise ValueError("failed")
+        # the failed user's chunk is rolled back
+        self.assertEqual(self.processed(), {user.pk for user in self.users[:2]})
@@ -0,0 +1,151 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection, models, transaction
+from django.db.migrations.exceptions import IrreversibleError
+from django.db.migrations.optimizer import MigrationOptimizer
+from django.db.migrations.state import ModelState, ProjectState
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+from django_db_rls.apps import rls_changes
+from django_db_rls.db_utils import (
+    AddPolicy,
+    AlterPolicy,
+    RemovePolicy,
+    create_policy,
+    prefix_config,
+)
+from django_db_rls.policy import Policy
+
+from .models import Item
+
+
+def current_setting(name):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT current_setting(%s)", [name])
+        return cursor.fetchone()[0]
+
+
+class ExecuteDDLTests(TestCase):
+    def test_lock_timeout_restored(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = '7s'")
+        with connection.schema_editor() as editor:
+            create_policy(editor, "test", User, "true", None, lock_timeout="1s")
+        self.assertEqual(current_setting("lock_timeout"), "7s")
+
+
+@override_settings(DB_RLS_POOL_SAFE=True)
+class PoolSafeTests(TransactionTestCase):
+    def setUp(self):
+        # as left behind on the connection by a previous checkout
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('app.user', '42', false)")
+        self.addCleanup(self.reset)
+
+    def reset(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('app.user', '', false)")
+
+    def test_reset_in_transaction(self):
+        with self.assertLogs("django_db_rls", "WARNING"):
+            with connection.execute_wrapper(prefix_config), transaction.atomic():
+                self.assertEqual(current_setting("app.user"), "")
+                self.assertEqual(current_setting("app.user"), "")
+
+    def test_reset_in_autocommit(self):
+        with connection.execute_wrapper(prefix_config):
+            with self.assertLogs("django_db_rls", "WARNING"):
+                self.assertEqual(current_setting("app.user"), "")
+
+    def test_reset_separate_statement_in_autocommit(self):
+        user = User.objects.create(username="user")
+        with connection.execute_wrapper(prefix_config), connection.cursor() as cursor:
+            with self.assertLogs("django_db_rls", "WARNING"):
+                cursor.executemany(
+                    "UPDATE auth_user SET first_name = current_setting('app.user') WHERE id = %s",
+                    [[user.pk]],
+                )
+        user.refresh_from_db()
+        self.assertEqual(user.first_name, "")
+
+    def test_reset_with_server_side_binding(self):
+        options = connection.settings_dict["OPTIONS"]
+        with mock.patch.dict(options, server_side_binding=True):
+            with connection.execute_wrapper(prefix_config):
+                with self.assertLogs("django_db_rls", "WARNING"):
+                    self.assertEqual(current_setting("app.user"), "")
+
+
+class AlterPolicyTests(TestCase):
+    def test_backwards_without_prior_policy(self):
+        state = ProjectState()
+        state.add_model(
+            ModelState("tests", "note", [("id", models.AutoField(primary_key=True))])
+        )
+        operation = AlterPolicy("note", "owner", "true", None)
+        with connection.schema_editor() as editor:
+            with self.assertRaisesMessage(IrreversibleError, "Alter Policy owner"):
+                operation.database_backwards("tests", editor, state, state)
+
+
+class PolicyChangesTests(SimpleTestCase):
+    def changes(self, from_policy, to_policy):
+        states = []
+        for policy in [from_policy, to_policy]:
+            state = ProjectState()
+            model_state = ModelState.from_model(Item)
+            model_state.options["db_rls_policies"] = [policy]
+            state.add_model(model_state)
+            states.append((state, model_state))
+        (from_state, from_model_state), (to_state, to_model_state) = states
+        return rls_changes(
+            "tests", "item", from_state, to_state, from_model_state, to_model_state
+        )
+
+    def test_altered(self):
+        operations = self.changes(
+            Policy(name="p", using="owner = 1", check="owner = 1"),
+            Policy(name="p", using="owner = 2", check="owner = 2"),
+        )
+        self.assertEqual([type(operation) for operation in operations], [AlterPolicy])
+
+    def test_expression_removed(self):
+        operations = self.changes(
+            Policy(name="p", using="owner = 1", check="owner = 1"),
+            Policy(name="p", using="owner = 1"),
+        )
+        self.assertEqual(
+            [type(operation) for operation in operations], [RemovePolicy, AddPolicy]
+        )
+
+    def test_expression_added(self):
+        operations = self.changes(
+            Policy(name="p", check="owner = 1"),
+            Policy(name="p", using="owner = 1", check="owner = 1"),
+        )
+        self.assertEqual(
+            [type(operation) for operation in operations], [RemovePolicy, AddPolicy]
+        )
+
+    def optimize(self, using, check):
+        operations = [
+            RemovePolicy("item", "p", "owner = 1", "owner = 1"),
+            AddPolicy("item", "p", using, check),
+        ]
+        return MigrationOptimizer().optimize(operations, "tests")
+
+    def test_reduced_to_alter(self):
+        operations = self.optimize("owner = 2", "owner = 2")
+        self.assertEqual([type(operation) for operation in operations], [AlterPolicy])
+
+    def test_not_reduced_with_expression_removed(self):
+        operations = self.optimize("owner = 1", None)
+        self.assertEqual(
+            [type(operation) for operation in operations], [RemovePolicy, AddPolicy]
+        )
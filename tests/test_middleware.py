@@ -0,0 +1,34 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TransactionTestCase
+
+from django_db_rls.db_utils import get_config_cache
+from django_db_rls.middleware import LazyAtomicRequestMiddleware
+
+from .models import Item
+
+
+class LazyAtomicRequestMiddlewareTests(TransactionTestCase):
+    async def test_async(self):
+        user = await User.objects.acreate(username="user")
+        contexts = []
+
+        async def get_response(request):
+            await Item.objects.acount()
+            contexts.append(await sync_to_async(get_config_cache)())
+            return HttpResponse()
+
+        middleware = LazyAtomicRequestMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = AsyncRequestFactory().get("/")
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        await middleware(request)
+        self.assertEqual(contexts, [{"app.user": str(user.pk)}])
+        # the atomic block opened by the first query is closed
+        self.assertFalse(await sync_to_async(lambda: connection.in_atomic_block)())
@@ -0,0 +1,85 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from django_db_rls.db_utils import AppUser, InAppGroups, set_config
+from django_db_rls.policy import IsSuperuserPolicy, Policy, compile_expression
+
+from .models import Item
+from .utils import apply_policies, explain, unprivileged_role
+
+
+class CompileExpressionTests(SimpleTestCase):
+    def test_expression(self):
+        self.assertEqual(
+            compile_expression(Q(pk=AppUser()), User),
+            """"auth_user"."id" = (nullif(current_setting('app.user', true), '')::int)""",
+        )
+
+    def test_sql(self):
+        self.assertEqual(compile_expression("id = 1", User), "id = 1")
+
+    def test_callable_returning_sql(self):
+        self.assertEqual(compile_expression(lambda: "id = 1", User), "id = 1")
+
+    def test_callables_differing_in_defaults(self):
+        self.assertEqual(
+            [compile_expression(lambda v=v: Q(owner=v), Item) for v in (1, 2)],
+            ['"tests_item"."owner" = 1', '"tests_item"."owner" = 2'],
+        )
+
+    def test_callables_differing_in_globals(self):
+        namespace = {"Q": Q}
+        exec("def using(): return Q(owner=OWNER)", namespace)
+        sql = []
+        for owner in (1, 2):
+            namespace["OWNER"] = owner
+            sql.append(compile_expression(namespace["using"], Item))
+        self.assertEqual(sql, ['"tests_item"."owner" = 1', '"tests_item"."owner" = 2'])
+
+
+@override_settings(DB_RLS_OPTIMIZE_POLICIES=True)
+class OptimizePoliciesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        table = connection.ops.quote_name(Item._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (owner, title)
+                SELECT i % 1000 + 1, 'item ' || i FROM generate_series(1, 10000) i
+                """
+            )
+            cursor.execute(f"ANALYZE {table}")
+
+    def test_index_scan(self):
+        apply_policies(Item, Policy(using=Q(owner=AppUser()), name="owner"))
+        with unprivileged_role(Item):
+            set_config("app.user", 1)
+            plan = explain(Item.objects.all())
+            self.assertEqual(Item.objects.count(), 10)
+        self.assertIn("InitPlan", plan)
+        self.assertRegex(plan, r"Index Scan (on|using) tests_item_owner")
+        self.assertIn("Index Cond: (owner = ", plan)
+
+    def test_in_app_groups(self):
+        apply_policies(Item, Policy(using=InAppGroups("owner"), name="groups"))
+        with unprivileged_role(Item):
+            set_config("app.group_ids", "{1,2}")
+            plan = explain(Item.objects.all())
+            self.assertEqual(Item.objects.count(), 20)
+        self.assertIn("InitPlan", plan)
+
+    def test_subquery_evaluated_once(self):
+        apply_policies(
+            Item,
+            Policy(using=Q(owner=AppUser()), name="owner"),
+            IsSuperuserPolicy(),
+        )
+        with unprivileged_role(Item, User):
+            set_config("app.user", 1)
+            plan = explain(Item.objects.all())
+        # the superuser subquery is an InitPlan rather than a SubPlan run for every row
+        self.assertIn("InitPlan", plan)
+        self.assertNotIn("SubPlan", plan)
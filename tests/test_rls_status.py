@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from django_db_rls.management.commands.rls_status import table_status
+
+
+def model(**options):
+    return SimpleNamespace(_meta=SimpleNamespace(**options))
+
+
+class TableStatusTests(SimpleTestCase):
+    def test_forced_by_default(self):
+        self.assertEqual(
+            table_status(model(db_rls=True), (True, True, True, None), []), []
+        )
+
+    def test_forced_with_force_false(self):
+        self.assertEqual(
+            table_status(
+                model(db_rls=True, db_rls_force=False), (True, True, True, None), []
+            ),
+            ["rls forced but db_rls_force = False"],
+        )
+
+    def test_not_forced(self):
+        self.assertEqual(
+            table_status(
+                model(db_rls=True, db_rls_force=True), (True, False, True, None), []
+            ),
+            ["rls not forced"],
+        )
@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+from django_db_rls.db_utils import create_policy, enable_rls
+
+ROLE = "django_db_rls_test"
+
+
+@contextmanager
+def unprivileged_role(*models):
+    """
+    Switch to an unprivileged role, which RLS applies to, granted access to the models' tables for the rest of the
+    transaction.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE ROLE "{ROLE}" NOLOGIN NOBYPASSRLS')
+        for model in models:
+            table = connection.ops.quote_name(model._meta.db_table)
+            cursor.execute(
+                f'GRANT SELECT, INSERT, UPDATE, DELETE ON {table} TO "{ROLE}"'
+            )
+        cursor.execute(f'SET LOCAL ROLE "{ROLE}"')
+        try:
+            yield
+        finally:
+            cursor.execute("RESET ROLE")
+            cursor.execute(f'DROP OWNED BY "{ROLE}"')
+            cursor.execute(f'DROP ROLE "{ROLE}"')
+
+
+def apply_policies(model, *policies):
+    with connection.schema_editor() as editor:
+        enable_rls(editor, model)
+        for policy in policies:
+            policy.compile(model)
+            create_policy(
+                editor,
+                policy.name,
+                model,
+                policy.using,
+                policy.check,
+                **policy.options,
+            )
+
+
+def explain(queryset):
+    with connection.cursor() as cursor:
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f"EXPLAIN {sql}", params)
+        return "\n".join(line for line, in cursor.fetchall())